@@ -0,0 +1,175 @@
+"""
+Local stand-ins for every backend the app talks to, for benchmarking without network access.
+
+Serves, on one port:
+    POST /hf/models/{model}               Hugging Face inference API (HF_URL)
+    GET  /pollinations/prompt/{prompt}    Pollinations image endpoint (POLLINATIONS_URL)
+    POST /gradio/predict?media=image      A gradio Space prediction (see FakeGradioClient)
+    POST /imgur/3/upload                  Imgur upload API (IMGUR_UPLOAD_URL)
+    *    /telegram/bot{token}/{method}    Telegram Bot API (TELEGRAM_API_URL)
+
+Each backend answers after a latency drawn from a log-normal distribution and fails at a
+configurable rate, so tail latency and error handling can be exercised.
+
+Run on its own with: python -m benchmarks.fake_providers --port 8765
+"""
+import os
+import io
+import json
+import math
+import random
+import asyncio
+import argparse
+import tempfile
+import itertools
+from dataclasses import dataclass, asdict
+
+import requests
+from aiohttp import web
+from PIL import Image
+
+@dataclass
+class LatencyProfile:
+    """A log-normal latency with the given median (seconds) and spread, and a failure rate."""
+    median: float
+    sigma: float = 0.5
+    error_rate: float = 0.0
+
+    def sample(self, time_scale: float = 1.0) -> float:
+        return random.lognormvariate(math.log(self.median), self.sigma) * time_scale
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+DEFAULT_PROFILES = {
+    'hf': LatencyProfile(median=3.0, sigma=0.6, error_rate=0.05),
+    'pollinations': LatencyProfile(median=2.0, sigma=0.8, error_rate=0.02),
+    'gradio': LatencyProfile(median=5.0, sigma=0.5, error_rate=0.05),
+    'imgur': LatencyProfile(median=0.5, sigma=0.4, error_rate=0.01),
+    'telegram': LatencyProfile(median=0.2, sigma=0.3, error_rate=0.0),
+}
+
+def load_profiles(overrides: str = None) -> dict:
+    """The default profiles, updated from a JSON object such as '{"hf": {"median": 1, "error_rate": 0.2}}'."""
+    profiles = {name: LatencyProfile(**asdict(profile)) for name, profile in DEFAULT_PROFILES.items()}
+    for name, values in json.loads(overrides or "{}").items():
+        profiles[name] = LatencyProfile(**{**asdict(profiles.get(name, LatencyProfile(1.0))), **values})
+    return profiles
+
+def make_image(width: int, height: int, image_format: str) -> bytes:
+    """A gradient with some noise, so the payload compresses like a real picture."""
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.effect_noise((width, height), 32).convert("RGB")
+    buffer = io.BytesIO()
+    Image.blend(image, noise, 0.3).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+class FakeProviders:
+    def __init__(self, profiles: dict, time_scale: float = 1.0, width: int = 1280, height: int = 720):
+        self.profiles = profiles
+        self.time_scale = time_scale
+        self.jpeg = make_image(width, height, "JPEG")
+        self.png = make_image(width, height, "PNG")
+        self.webp = make_image(width, height, "WEBP")
+        # Not a playable video, only a payload of a realistic size
+        self.mp4 = os.urandom(512 * 1024)
+        self.upload_ids = itertools.count(1)
+
+    async def _delay(self, name):
+        profile = self.profiles[name]
+        await asyncio.sleep(profile.sample(self.time_scale))
+        return profile.fails()
+
+    async def hf(self, request):
+        await request.read()
+        if await self._delay('hf'):
+            return web.json_response({'error': 'Model is currently loading'}, status=503)
+        return web.Response(body=self.png, content_type="image/png")
+
+    async def pollinations(self, request):
+        if await self._delay('pollinations'):
+            return web.Response(status=502, text="Bad Gateway")
+        return web.Response(body=self.jpeg, content_type="image/jpeg")
+
+    async def gradio(self, request):
+        await request.read()
+        if await self._delay('gradio'):
+            return web.json_response({'error': 'Space is restarting'}, status=500)
+        if request.query.get('media') == 'video':
+            return web.Response(body=self.mp4, content_type="video/mp4")
+        return web.Response(body=self.webp, content_type="image/webp")
+
+    async def imgur(self, request):
+        # Read the whole multipart body, as Imgur would
+        await request.read()
+        if await self._delay('imgur'):
+            return web.json_response({'success': False, 'status': 429}, status=429)
+        link = f"{request.scheme}://{request.host}/imgur/i/{next(self.upload_ids)}.png"
+        return web.json_response({'success': True, 'status': 200, 'data': {'link': link}})
+
+    async def telegram(self, request):
+        await request.read()
+        if await self._delay('telegram'):
+            return web.json_response({'ok': False, 'description': 'Too Many Requests'}, status=429)
+        method = request.match_info['method']
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {'id': 1, 'first_name': 'Benchmark', 'username': 'benchmark_bot'}})
+        return web.json_response({'ok': True, 'result': {'message_id': next(self.upload_ids)}})
+
+    async def health(self, request):
+        return web.Response(text="ok")
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post('/hf/models/{model:.+}', self.hf)
+        app.router.add_get('/pollinations/prompt/{prompt:.+}', self.pollinations)
+        app.router.add_post('/gradio/predict', self.gradio)
+        app.router.add_post('/imgur/3/upload', self.imgur)
+        app.router.add_route('*', '/telegram/bot{token}/{method}', self.telegram)
+        app.router.add_get('/health', self.health)
+        return app
+
+def provider_env(base_url: str) -> dict:
+    """Environment variables that point the app at fake providers served from base_url."""
+    return {
+        'HF_URL': f"{base_url}/hf/models/",
+        'HF_TOKEN': "benchmark",
+        'POLLINATIONS_URL': f"{base_url}/pollinations/prompt/{{prompt}}?model={{model}}&seed={{seed}}",
+        'IMGUR_UPLOAD_URL': f"{base_url}/imgur/3/upload",
+        'IMGUR_CLIENT_ID': "benchmark",
+        'TELEGRAM_API_URL': f"{base_url}/telegram",
+        'TELEGRAM_BOT_TOKEN': "benchmark",
+        'TELEGRAM_CHAT_ID': "1",
+    }
+
+class FakeGradioClient:
+    """
+    Stands in for gradio_client.Client. predict() blocks like the real one, downloads the
+    result from the fake gradio endpoint and returns a local file path, or {'video': path}.
+    """
+    def __init__(self, base_url: str, media_type: str = "image"):
+        self.url = f"{base_url}/gradio/predict?media={media_type}"
+        self.media_type = media_type
+        self.session = requests.Session()
+
+    def predict(self, *args, api_name=None, **kwargs):
+        response = self.session.post(self.url, json={'data': list(args), 'api_name': api_name}, timeout=(10, 300))
+        response.raise_for_status()
+        suffix = ".mp4" if self.media_type == "video" else ".webp"
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as file:
+            file.write(response.content)
+        return {'video': file.name} if self.media_type == "video" else file.name
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake Hugging Face, Pollinations, gradio, Imgur and Telegram backends.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplies every sampled latency")
+    parser.add_argument("--profiles", help="JSON overrides for the latency profiles")
+    args = parser.parse_args()
+
+    providers = FakeProviders(load_profiles(args.profiles), args.time_scale)
+    web.run_app(providers.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+if __name__ == "__main__":
+    main()
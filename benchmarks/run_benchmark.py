@@ -0,0 +1,263 @@
+"""
+Benchmarks the comparison pipeline against local fake providers (see fake_providers.py).
+
+Scenarios:
+    pipeline    generate_html() for the selected models plus queueing the Telegram copy, as
+                the job queue runs them, one comparison per simulated user at a time
+    generators  The generator classes on their own, each call stored right away, without
+                the engine, circuit breakers, caches or upload queue
+
+Every user count runs in a fresh process, so peak RSS is measured per run. Reports
+throughput, p50/p95/p99 latency, failures and peak RSS.
+
+Usage (from the project root):
+    python -m benchmarks.run_benchmark --users 1 10 100 --time-scale 0.2
+"""
+import os
+import sys
+import copy
+import json
+import time
+import uuid
+import socket
+import asyncio
+import argparse
+import resource
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_providers import provider_env, FakeGradioClient
+
+DEFAULT_MODEL_APPS = ('pollinations', 'pollinations', 'pollinations',
+                      'black-forest-labs/FLUX.1-schnell', 'stabilityai/sdxl-turbo', 'hand_drawn_cartoon_style')
+
+class NullProgress:
+    """Takes the place of st.progress() and st.empty() outside Streamlit."""
+    def progress(self, value):
+        pass
+
+    def text(self, value):
+        pass
+
+class EchoTranslator:
+    """Keeps translation off the network: prompts are already in English."""
+    def translate(self, text):
+        return text
+
+    def translate_batch(self, texts):
+        return list(texts)
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def select_models(titles=None):
+    from utils.catalog import get_catalog
+    catalog = get_catalog()
+    if titles:
+        return catalog.select_models(titles)
+    # The first models of each app, as many as DEFAULT_MODEL_APPS lists it
+    used = {}
+    selected = []
+    for generation_app in DEFAULT_MODEL_APPS:
+        candidates = catalog.models_for_app(generation_app)
+        if used.get(generation_app, 0) < len(candidates):
+            selected.append(candidates[used.get(generation_app, 0)])
+            used[generation_app] = used.get(generation_app, 0) + 1
+    return selected
+
+def install_fakes(base_url):
+    """Points the process-wide singletons at the fakes. Must run before the first comparison."""
+    from utils import generator_registry, translation_cache
+    from utils.text_to_image.hand_drawn_cartoon_generator import HandDrawnCartoonGenerator
+    from utils.text_to_video.animatediff_lightning_generator import AnimateDiffLightningGenerator
+
+    generator_registry._registry = generator_registry.GeneratorRegistry(factories={
+        'hand_drawn_cartoon_style': lambda: HandDrawnCartoonGenerator(client=FakeGradioClient(base_url)),
+        'animatediff_lightning': lambda: AnimateDiffLightningGenerator(client=FakeGradioClient(base_url, "video")),
+    })
+    translation_cache._translation_cache = translation_cache.TranslationCache(translator=EchoTranslator())
+
+def run_pipeline_user(user, comparisons, models):
+    from utils.comparison import generate_html, send_telegram_message_and_file
+
+    async def compare(prompt):
+        selected_models = copy.deepcopy(models)
+        html_content = await generate_html(prompt, prompt, selected_models, NullProgress(), NullProgress())
+        send_telegram_message_and_file(prompt, html_content)
+        return sum(1 for model in selected_models if not model.get('media_url'))
+
+    results = []
+    for i in range(comparisons):
+        # Unique prompts, so the result cache doesn't turn the run into cache hits
+        prompt = f"benchmark user {user} comparison {i} {uuid.uuid4().hex[:8]}"
+        started_at = time.perf_counter()
+        try:
+            failed_models = asyncio.run(compare(prompt))
+            error = None
+        except Exception as e:
+            failed_models, error = len(models), str(e)
+        results.append({'latency': time.perf_counter() - started_at, 'failed_models': failed_models, 'error': error})
+    return results
+
+def run_generators_user(user, comparisons, models):
+    from utils.comparison import call_generator
+    from utils.generator_registry import get_generator_registry
+
+    async def generate(prompt, model):
+        generator = await get_generator_registry().aget(model)
+        media = await call_generator(generator, prompt, model)
+        if media is None:
+            return None
+        return await generator.http.run(generator.store.save_generated(media))
+
+    results = []
+    for i in range(comparisons):
+        for model in models:
+            prompt = f"benchmark user {user} call {i} {uuid.uuid4().hex[:8]}"
+            started_at = time.perf_counter()
+            try:
+                media_url = asyncio.run(generate(prompt, model))
+                error = None if media_url else "no media"
+            except Exception as e:
+                error = str(e)
+            results.append({'latency': time.perf_counter() - started_at, 'failed_models': int(error is not None), 'error': error})
+    return results
+
+SCENARIOS = {
+    'pipeline': run_pipeline_user,
+    'generators': run_generators_user,
+}
+
+def run_child(args):
+    """Runs one scenario at one user count in this process and writes the summary to args.output."""
+    install_fakes(args.base_url)
+    models = select_models(args.models)
+    run_user = SCENARIOS[args.scenario]
+
+    started_at = time.perf_counter()
+    # Like Streamlit, every session runs in its own thread with its own event loop
+    with ThreadPoolExecutor(max_workers=args.users) as executor:
+        futures = [executor.submit(run_user, user, args.comparisons, models) for user in range(args.users)]
+        results = [result for future in futures for result in future.result()]
+    wall = time.perf_counter() - started_at
+
+    latencies = [result['latency'] for result in results]
+    summary = {
+        'scenario': args.scenario,
+        'users': args.users,
+        'models': len(models),
+        'operations': len(results),
+        'errors': sum(1 for result in results if result['error']),
+        'failed_models': sum(result['failed_models'] for result in results),
+        'wall': wall,
+        'throughput': len(results) / wall,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    # The app prints as it goes, so the summary goes to a file rather than stdout
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(summary, file)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_until_ready(base_url, timeout=30):
+    import requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).ok:
+                return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Fake providers did not start at {base_url}")
+
+def run(args):
+    port = args.port or free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server_command = [sys.executable, "-m", "benchmarks.fake_providers", "--port", str(port), "--time-scale", str(args.time_scale)]
+    if args.profiles:
+        server_command += ["--profiles", args.profiles]
+    server = subprocess.Popen(server_command)
+
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    env = {
+        **os.environ,
+        **provider_env(base_url),
+        'MEDIA_STORE': "imgur",
+        'RESULT_CACHE_PATH': os.path.join(workdir, "cache.db"),
+        'TRANSLATION_CACHE_PATH': os.path.join(workdir, "cache.db"),
+        'MEDIA_INDEX_PATH': os.path.join(workdir, "cache.db"),
+        'METRICS_PORT': "0",
+        'METRICS_TRACE_PATH': os.path.join(workdir, "trace.jsonl"),
+    }
+    summaries = []
+    try:
+        wait_until_ready(base_url)
+        for scenario in args.scenarios:
+            for users in args.users:
+                result_path = os.path.join(workdir, f"{scenario}-{users}.json")
+                command = [sys.executable, "-m", "benchmarks.run_benchmark", "--child", "--base-url", base_url,
+                           "--scenario", scenario, "--users", str(users), "--comparisons", str(args.comparisons),
+                           "--output", result_path]
+                if args.models:
+                    command += ["--models", *args.models]
+                output = subprocess.run(command, env=env, capture_output=True, text=True)
+                if output.returncode != 0:
+                    print(output.stderr, file=sys.stderr)
+                    raise RuntimeError(f"Benchmark run failed: {scenario} with {users} users")
+                with open(result_path, "r", encoding="utf-8") as file:
+                    summaries.append(json.load(file))
+                print_summary(summaries[-1])
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"\nSpan trace: {env['METRICS_TRACE_PATH']} (python -m utils.metrics {env['METRICS_TRACE_PATH']})")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(summaries, file, indent=2)
+    return summaries
+
+def print_summary(summary):
+    if not hasattr(print_summary, "header_printed"):
+        print(f"{'scenario':<11} {'users':>5} {'ops':>6} {'errors':>6} {'failed':>6} {'ops/s':>8} "
+              f"{'p50':>8} {'p95':>8} {'p99':>8} {'rss MB':>8}")
+        print_summary.header_printed = True
+    print(f"{summary['scenario']:<11} {summary['users']:>5} {summary['operations']:>6} {summary['errors']:>6} "
+          f"{summary['failed_models']:>6} {summary['throughput']:>8.2f} {summary['p50']:>8.2f} "
+          f"{summary['p95']:>8.2f} {summary['p99']:>8.2f} {summary['peak_rss_mb']:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the comparison pipeline against local fake providers.")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 100], help="Concurrent simulated users per run")
+    parser.add_argument("--comparisons", type=int, default=2, help="Comparisons (or generator rounds) per user")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--models", nargs="+", help="Model titles from data/models.json (default: a mix of providers)")
+    parser.add_argument("--time-scale", type=float, default=0.2, help="Multiplies every fake latency")
+    parser.add_argument("--profiles", help="JSON overrides for the fake latency profiles, see fake_providers.py")
+    parser.add_argument("--port", type=int, help="Port for the fake providers (default: a free port)")
+    parser.add_argument("--output", help="Also write the summaries to this JSON file")
+    # Internal: a single run in a child process
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--scenario", choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.users = args.users[0]
+        run_child(args)
+    else:
+        run(args)
+
+if __name__ == "__main__":
+    main()
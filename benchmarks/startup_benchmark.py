@@ -0,0 +1,132 @@
+"""
+Measures the app's cold start: how long the modules main.py imports take to import in a
+fresh interpreter (from python -X importtime), and optionally how long the first render
+of the page takes (Streamlit's AppTest, in a fresh process, with empty local caches).
+
+Reports the median over --repeat runs, the slowest imports by cumulative and by self
+time, and which third-party packages are loaded at all. With --budget-ms (or
+STARTUP_IMPORT_BUDGET_MS), exits with an error when the import time goes over budget,
+so a heavy import creeping back in fails the check.
+
+Usage (from the project root):
+    python -m benchmarks.startup_benchmark --repeat 5 --render --budget-ms 1500
+"""
+import os
+import re
+import ast
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# "import time: self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+RENDER_SCRIPT = """
+import time
+from streamlit.testing.v1 import AppTest
+started_at = time.perf_counter()
+app = AppTest.from_file("main.py", default_timeout=120)
+app.run()
+print(time.perf_counter() - started_at)
+if app.exception:
+    raise SystemExit(str(app.exception))
+"""
+
+def app_imports(path: str = "main.py") -> list:
+    """The modules an entry point imports at its top level, in order."""
+    with open(path, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+def isolated_env(workdir: str) -> dict:
+    """Keeps a measurement from touching the real caches, gallery index, thumbnails and metrics port."""
+    return {
+        **os.environ,
+        'RESULT_CACHE_PATH': os.path.join(workdir, "cache.db"),
+        'TRANSLATION_CACHE_PATH': os.path.join(workdir, "cache.db"),
+        'MEDIA_INDEX_PATH': os.path.join(workdir, "cache.db"),
+        'JOB_QUEUE_PATH': os.path.join(workdir, "cache.db"),
+        'GALLERY_INDEX_PATH': os.path.join(workdir, "gallery_index.json"),
+        'THUMBNAIL_DIR': os.path.join(workdir, "thumbnails"),
+        'METRICS_PORT': "0",
+        'METRICS_TRACE_PATH': os.path.join(workdir, "trace.jsonl"),
+    }
+
+def measure_imports(modules: list, env: dict) -> dict:
+    """Imports the modules in a fresh interpreter. Returns {module: (self, cumulative, top level)}, in seconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing the app failed:\n{result.stderr[-2000:]}")
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings[name] = (int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) == 1)
+    return timings
+
+def measure_render(env: dict) -> float:
+    result = subprocess.run([sys.executable, "-c", RENDER_SCRIPT], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"The first render failed:\n{result.stderr[-2000:]}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the app's import time and first render.")
+    parser.add_argument("--entry", default="main.py", help="Entry point whose top-level imports are measured")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs to take the median of")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--render", action="store_true", help="Also time the first render of the page")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 0)),
+                        help="Fail when the median import time is over this (0: no budget)")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    modules = app_imports(args.entry)
+    env = isolated_env(tempfile.mkdtemp(prefix="startup-"))
+    runs = [measure_imports(modules, env) for _ in range(args.repeat)]
+    # An import's total is its cumulative time at the top level
+    totals = [sum(cumulative for _, cumulative, top_level in run.values() if top_level) for run in runs]
+    import_time = statistics.median(totals)
+    timings = runs[totals.index(import_time)] if import_time in totals else runs[-1]
+
+    print(f"Imports of {args.entry} ({len(modules)} modules): median {import_time * 1000:.0f} ms "
+          f"over {args.repeat} runs (min {min(totals) * 1000:.0f} ms, max {max(totals) * 1000:.0f} ms)")
+    print("\nSlowest imports, cumulative:")
+    for name, (_, cumulative, _) in sorted(timings.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"  {cumulative * 1000:8.1f} ms  {name}")
+    print("\nSlowest imports, self:")
+    for name, (own, _, _) in sorted(timings.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {own * 1000:8.1f} ms  {name}")
+    packages = sorted({name.split(".")[0] for name in timings} - set(sys.stdlib_module_names))
+    print(f"\nPackages loaded: {', '.join(packages)}")
+
+    report = {'entry': args.entry, 'modules': modules, 'import_ms': import_time * 1000,
+              'runs_ms': [total * 1000 for total in totals], 'packages': packages}
+    if args.render:
+        # A fresh workdir per run, so every render starts without an index or thumbnails
+        renders = [measure_render(isolated_env(tempfile.mkdtemp(prefix="startup-"))) for _ in range(args.repeat)]
+        report['first_render_ms'] = statistics.median(renders) * 1000
+        print(f"\nFirst render: median {report['first_render_ms']:.0f} ms over {args.repeat} runs")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.budget_ms and import_time * 1000 > args.budget_ms:
+        print(f"\nOver the import budget: {import_time * 1000:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,29 @@
-import requests
 import asyncio
+import html
 import streamlit as st
-from urllib.parse import urlparse
-import json
-from jinja2 import Template
-import base64
-from io import BytesIO
-import os
-from dotenv import load_dotenv
-import time
-from deep_translator import GoogleTranslator
-from tenacity import retry, stop_after_attempt, wait_fixed
-from PIL import Image
 
 # Initialize components
+from utils.config import load_config
 from utils.init import initialize
 from utils.counter import increment_user_count, get_user_count
-from utils.TelegramSender import TelegramSender
 
-from utils.text_to_image.pollinations_generator import PollinationsGenerator
 # from utils.text_to_image.sdxl_lightning_generator import SDXLLightningGenerator
-from utils.text_to_image.hand_drawn_cartoon_generator import HandDrawnCartoonGenerator
-from utils.text_to_video.animatediff_lightning_generator import AnimateDiffLightningGenerator
-from utils.imgur_uploader import ImgurUploader
-from utils.text_to_image.unsplash_generator import UnsplashGenerator
-from utils.text_to_image.huggins_generator import HugginsGenerator
+from utils.translation_cache import start_warm_up
+from utils.model_health import get_model_health
+from utils.metrics import start_metrics_server
+from utils.job_queue import get_job_queue
+from utils.job_downloads import get_job_downloads, FORMATS as DOWNLOAD_FORMATS
+from utils.telegram_delivery import start_telegram_delivery
+from utils.thumbnails import picture_html, get_thumbnail_cache
+from utils.gallery_index import get_gallery_index, start_warm_up as start_gallery_warm_up
+from utils.catalog import get_catalog
 
 # Load environment variables from .env file
-load_dotenv()
+load_config()
 
 # Initialize session state
 if 'state' not in st.session_state:
     st.session_state.state = {
-        'telegram_sender': TelegramSender(),
         'counted': False,
     }
 
@@ -40,258 +31,160 @@ if 'state' not in st.session_state:
 # Set page config at the very beginning
 st.set_page_config(layout="wide", initial_sidebar_state="collapsed", page_title="מחולל תמונות AI", page_icon="📷")
 
-UPLOAD_FOLDER = "uploads"
-
-# Read the HTML template
-with open("template.html", "r", encoding="utf-8") as file:
-    html_template = file.read()
-
-# Read models from JSON file
-with open("data/models.json", "r", encoding="utf-8") as file:
-    models_data = json.load(file)
-    models = models_data["models"]
-
-def get_file_type_from_url(url):
-    if url is None:
-        return 'error'
-    parsed_url = urlparse(url)
-    path = parsed_url.path
-    if path.endswith('.mp4'):
-        return 'video'
+RESULT_CARD_COLUMNS = 3
+# Seconds between progress refreshes of a running comparison
+JOB_POLL_INTERVAL = 1
+# Download buttons under a finished comparison, by format
+DOWNLOAD_LABELS = {
+    'html': "לשמירת התמונות",
+    'offline': "🖼️ עותק לצפייה ללא חיבור (HTML)",
+    'zip': "📦 עותק לצפייה ללא חיבור (ZIP)",
+    'json': "🧾 נתוני ההשוואה (JSON)",
+}
+
+def format_model_option(title):
+    """Shows each model's current health next to its title in the model picker."""
+    model = get_catalog().model(title)
+    status = get_model_health().status_label(model)
+    return f"{title} {status}" if status else title
+
+def render_result_card(model, done=False):
+    title = html.escape(model['title'])
+    media_url = html.escape(model.get('media_url') or '')
+    if not done:
+        body = '<div class="result-card-status">⏳ מייצר...</div>'
+    elif model.get('media_type') == 'video':
+        body = f'<video src="{media_url}" controls autoplay loop muted playsinline></video>'
+    elif model.get('media_type') == 'image':
+        body = f'<a href="{media_url}" target="_blank"><img src="{media_url}" alt="{title}"/></a>'
+    elif model.get('timed_out'):
+        body = '<div class="result-card-status">⌛ חרג מזמן ההמתנה</div>'
+    elif model.get('unavailable'):
+        body = '<div class="result-card-status">⏸️ המודל לא זמין זמנית</div>'
     else:
-        return 'image'
-    # elif path.endswith(('.jpg', '.jpeg', '.png', '.gif')):
-    #     return 'image'
-    # else:
-    #     return 'unknown'
-
-def add_timestamp(prompt):
-    timestamp = int(time.time())
-    return f"{prompt} [Timestamp: {timestamp}]"
-
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(5))
-def generate_image(prompt, model_name):    
-    HF_TOKEN = os.getenv("HF_TOKEN")
-    HF_URL = os.getenv("HF_URL")    
-
-    if not HF_TOKEN:
-        raise ValueError("Hugging Face token must be set in environment variables")
-    if not HF_URL:
-        raise ValueError("Hugging Face URL must be set in environment variables")
-    
-    # Add random timestamp to the prompt
-    prompt_with_timestamp = add_timestamp(prompt)
-
-    url = HF_URL + model_name        
-    headers = {"Authorization": f"Bearer {HF_TOKEN}"}    
-
-    try:
-        print(f"Attempting to connect to {model_name}:")
-        print(url)
-        payload = ({"inputs": f"{prompt_with_timestamp}"})
-        response = requests.post(url, headers=headers, json=payload)
-        
-        image_bytes = response.content
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-        
-        uploader = ImgurUploader()
-        image_url = uploader.upload_media_to_imgur(
-            image_base64, 
-            "image",
-            model_name,  # Title
-            prompt  # Description
-        )
-        if image_url:
-            return image_url
-        else:
-            return None
-    except Exception as e:
-        print(f"Error generating image: {e}")
-        return None
-    
-def generate_media(prompt, model):
-    try:
-        if model['generation_app'] == 'pollinations':
-            pollinations_generator = PollinationsGenerator()
-            image_url= pollinations_generator.generate_image(prompt, model['name'])        
-        elif model['generation_app'] == 'hand_drawn_cartoon_style':
-            hand_drawn_cartoon_generator = HandDrawnCartoonGenerator()
-            image_url= hand_drawn_cartoon_generator.generate_image(prompt)
-        elif model['generation_app'] == 'animatediff_lightning':
-            animatediff_lightning_generator = AnimateDiffLightningGenerator()
-            image_url= animatediff_lightning_generator.generate_image(prompt)    
-        elif model['generation_app'] == 'unsplash':
-            unsplash_generator = UnsplashGenerator()
-            image_url= unsplash_generator.generate_image(prompt)         
-        # elif model['generation_app'] == 'sdxl_lightning':
-        #     sdxl_lightning_generator = SDXLLightningGenerator()
-        #     return sdxl_lightning_generator.generate_image(prompt)
-        else: 
-             huggins_generator = HugginsGenerator()
-             image_url= huggins_generator.generate_image(prompt, model['generation_app'])
-            # image_url = generate_image(prompt, model['generation_app'])
-            # return image_url
-    except Exception as e:
-        print(f"Error generating media for {model['title']}: {str(e)}")
-        return None
-    
-    # Remove 'https://' from the media_url if it exists
-    # if 'https://' in image_url:
-    #     image_url = image_url.replace('https://', '')
-    
-    print(f"Image generation for {model['generation_app']} is not implemented")
-    return image_url
-
-def generate_html(orginal_prompt,full_prompt, selected_models, progress_bar, status_text):
-    template = Template(html_template)    
-    english_prompt = translate_to_english(full_prompt)
-
-    print(f"Original Prompt: {orginal_prompt}")
-
-    total_models = len(selected_models)
-    for i, model in enumerate(selected_models, 1):
-        status_text.text(f"מייצר תמונה במודל: {model['title']} ({i}/{total_models})")
-        model['media_url'] = generate_media(english_prompt, model)
-        model['media_type'] = get_file_type_from_url(model['media_url'])
-        if model['media_url']:
-            print(f"Generated media URL for {model['title']}: {model['media_url']}")
-        else:
-            print(f"Failed to generate media for {model['title']}")
-        progress_bar.progress(i / total_models)
-
-    html_content = template.render(prompt=orginal_prompt, models=selected_models)
-    
-    return html_content
-
-def get_binary_file_downloader_html(bin_file, file_label='File'):
-    bin_file.seek(0)
-    bin_str = base64.b64encode(bin_file.read()).decode()
-    href = f'''
-    <div class="download-button-container">
-        <a href="data:application/octet-stream;base64,{bin_str}" download="{file_label}" class="download-button">
-            לשמירת התמונות
-        </a>
+        body = '<div class="result-card-status">❌ היצירה נכשלה</div>'
+    return f'''
+    <div class="result-card">
+        <div class="result-card-title">{title}</div>
+        <div class="result-card-media">{body}</div>
     </div>
     '''
-    return href
-
-@st.cache_resource
-def get_translator():
-    return GoogleTranslator(source='auto', target='en')
 
-def translate_to_english(text):
-    try:
-        translator = get_translator()
-        return translator.translate(text)
-    except Exception as e:
-        st.error(f"שגיאה בתרגום: {str(e)}")
-        return text
-                
-def load_html_file(file_name):
-    with open(file_name, 'r', encoding='utf-8') as f:
-        return f.read()
-
-async def send_telegram_message_and_file(message, file_content: BytesIO):
-    sender = TelegramSender()
-    try:
-        # Verify bot token
-        if await sender.verify_bot_token():
-            # Reset the file pointer to the beginning
-            # file_content.seek(0)
-            
-            # Modify the send_document method to accept BytesIO
-            await sender.send_document(file_content, caption=message)
-        else:
-            raise Exception("Bot token verification failed")
-    except Exception as e:
-        raise Exception(f"Failed to send Telegram message: {str(e)}")
-    finally:
-        await sender.close_session()
-
-def load_examples():
-    with open("data/Examples.json", "r", encoding="utf-8") as file:
-        return json.load(file)
-
-@st.cache_data
-def load_image(image_path):
-    return Image.open(image_path)
-
-@st.cache_data
-def get_image_data(base_path):
-    image_data = {}
-    for folder in os.listdir(base_path):
-        folder_path = os.path.join(base_path, folder)
-        if os.path.isdir(folder_path):
-            # Read the description file
-            description_file = os.path.join(folder_path, "prompt_description.md")
-            description = ""
-            if os.path.exists(description_file):
-                with open(description_file, 'r', encoding='utf-8') as f:
-                    description = f.read().strip()
-            
-            image_data[folder] = {
-                'description': description,
-                'models': []
-            }
-            for image_file in os.listdir(folder_path):                
-                if image_file.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-                    model_name = os.path.splitext(image_file)[0]
-                    image_data[folder]['models'].append({
-                        'name': model_name,
-                        'image_path': os.path.join(folder_path, image_file)
-                    })            
-    return image_data
+def show_result_cards(selected_models):
+    """One card per model: its media once the model has finished, a placeholder until then."""
+    columns = st.columns(min(len(selected_models), RESULT_CARD_COLUMNS))
+    for i, model in enumerate(selected_models):
+        with columns[i % len(columns)]:
+            st.markdown(render_result_card(model, done='media_url' in model), unsafe_allow_html=True)
+
+def show_job_progress(job_id):
+    """Redrawn every JOB_POLL_INTERVAL seconds while the job runs, without rerunning the whole page."""
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None or job.finished:
+        # Let the whole page rerun to show the final result
+        st.rerun()
+    st.markdown(job.payload['prompt'])
+    st.progress(job.progress)
+    if job.status == "queued":
+        st.text(f"ממתין בתור... ({queue.queue_position(job_id)} לפניך)")
+    else:
+        st.text(job.status_text or "מייצר תמונות נא להמתין בסבלנות ...")
+    # Each model's card fills in as soon as its media is ready
+    show_result_cards(job.models)
+
+def show_job(job_id):
+    """Shows a comparison job: live progress while it runs, the comparison page once it is done."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        # Expired or unknown job
+        st.session_state.pop('job_id', None)
+        st.query_params.pop('job', None)
+        return
+    if not job.finished:
+        st.fragment(show_job_progress, run_every=JOB_POLL_INTERVAL)(job_id)
+        return
+
+    st.markdown(job.payload['prompt'])
+    if job.status == "failed":
+        st.error(f"היצירה נכשלה: {job.error}")
+        return
+    show_downloads(job_id)
+    page = job.result
+    if isinstance(page, bytes):
+        page = page.decode('utf-8')
+    st.components.v1.html(page, height=600, scrolling=True)
+
+def show_downloads(job_id):
+    """
+    One download button per format. Their files are only built when clicked, and then
+    cached per job, so reruns don't send them to the browser again.
+    """
+    downloads = get_job_downloads()
+    columns = st.columns(len(DOWNLOAD_LABELS))
+    for column, (file_format, label) in zip(columns, DOWNLOAD_LABELS.items()):
+        file_name, mime = DOWNLOAD_FORMATS[file_format]
+        with column:
+            st.download_button(
+                label, downloads.loader(job_id, file_format), file_name=file_name, mime=mime,
+                key=f"download_{file_format}_{job_id}", on_click="ignore", width="stretch"
+            )
 
-def image_to_base64(img):
-    buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode()
- 
 def add_examples_images():    
-    image_data = get_image_data(UPLOAD_FOLDER)
-        
-    for prompt, data in image_data.items():
+    thumbnail_cache = get_thumbnail_cache()
+    for prompt, data in get_gallery_index().folders().items():
+        # Images whose thumbnails are still being built are shown as they are meanwhile
+        models = [(model, thumbnail_cache.lookup(model['image_path'], model['mtime'], model['size']))
+                  for model in data['models']]
+        if not models:
+            continue
         st.markdown(f"""
             <div class="description-container">
                 <div class="description">{data['description']}</div>
             </div>
             """, unsafe_allow_html=True)
         
-        model_cols = st.columns(len(data['models']))
+        model_cols = st.columns(len(models))
+        # Each thumbnail fills its column; the browser picks the width it needs
+        sizes = f"{max(1, 100 // len(models))}vw"
         
-        for col, model in zip(model_cols, data['models']):            
+        for col, (model, thumbnails) in zip(model_cols, models):            
             with col:
-                try:
-                    image = Image.open(model['image_path'])
-                    st.markdown(f'<div class="model-container">', unsafe_allow_html=True)
-                    st.image(image, None, use_container_width=True)
-                    st.markdown(f'<div class="model-name">{model["name"]}</div>', unsafe_allow_html=True)
-                    # st.markdown(f'<div class="model-name">{model['name']}</div>', unsafe_allow_html=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-                except Exception as e:
-                    st.error(f"Error loading image: {model['image_path']}. Error: {str(e)}")
+                if thumbnails is None:
+                    try:
+                        st.image(model['image_path'], width="stretch")
+                    except Exception as e:
+                        st.error(f"Error loading image: {model['image_path']}. Error: {str(e)}")
+                        continue
+                    st.markdown(f'<div class="model-name">{html.escape(model["name"])}</div>', unsafe_allow_html=True)
+                    continue
+                picture = picture_html(thumbnails, html.escape(model['name']), sizes, "gallery-image")
+                st.markdown(f'''
+                    <div class="model-container">
+                        {picture}
+                        <div class="model-name">{html.escape(model["name"])}</div>
+                    </div>
+                    ''', unsafe_allow_html=True)
     
     st.markdown("<hr>", unsafe_allow_html=True)
 
-# Add this function to load image styles
-@st.cache_data
-def load_image_styles():
-    with open("data/image_styles.json", "r", encoding="utf-8") as file:
-        return json.load(file)["styles"]
-
 async def main():
     title, image_path, footer_content = initialize()
+    # Models, styles, examples and the page's texts, loaded once and reloaded when edited
+    catalog = get_catalog()
+    # Translate the example prompts and style prefixes once per process
+    start_warm_up()
+    start_metrics_server()
+    start_telegram_delivery()
+    # The examples gallery and its thumbnails, indexed once and kept on disk
+    start_gallery_warm_up()
     st.title("מחולל תמונות AI 🌟")
     
-    # Load and display the custom expander HTML
-    expander_html = load_html_file('expander.html')
-    st.markdown(expander_html, unsafe_allow_html=True)    
-    
-    # Load examples
-    examples = load_examples()
+    # Display the custom expander HTML
+    st.markdown(catalog.text('expander'), unsafe_allow_html=True)    
 
     # Create a selectbox for examples with a label
-    example_titles = [""] + [example["title"] for example in examples]
+    example_titles = [""] + [example["title"] for example in catalog.examples]
     selected_example = st.selectbox(
         label="פרומפטים לדוגמא",  # Proper label for accessibility
         options=example_titles,
@@ -306,7 +199,7 @@ async def main():
 
      # Update prompt if an example is selected
     if selected_example and selected_example != "":
-        selected_example_data = next((example for example in examples if example["title"] == selected_example), None)
+        selected_example_data = catalog.example(selected_example)
         if selected_example_data:
             st.session_state.prompt = selected_example_data["prompt"]
 
@@ -314,8 +207,7 @@ async def main():
     prompt = st.text_area("יש לכתוב פרומפט ליצירת תמונה...", value=st.session_state.prompt, key='prompt_input', help="יצירת תמונות")
 
     # 2. Selectbox for style
-    image_styles = load_image_styles()
-    style_options = [style['name'] for style in image_styles]
+    style_options = [style['name'] for style in catalog.styles]
     selected_style = st.selectbox(
         "בחרו סגנון תמונה 🎨",
         options=style_options,
@@ -324,25 +216,25 @@ async def main():
     )
 
     # 3. Multiselect for models
-    total_models = len(models)
-    new_models = sum(1 for model in models if model['title'].startswith('🆕'))
-    model_options = [model['title'] for model in models]
+    model_options = catalog.model_titles
+    total_models = len(model_options)
+    new_models = sum(1 for title in model_options if title.startswith('🆕'))
     default_model = "⚡ Flux.1 (Grok)"
     selected_model_titles = st.multiselect(
        f"בחרו מודלי תמונה מהרשימה ({total_models} מודלים, מתוכם {new_models} חדשים) 👈 ",
         model_options,
         placeholder=f"בחרו מודלי תמונה מהרשימה ({total_models} מודלים, מתוכם {new_models} חדשים) 👈 ",
-        default=[default_model] if default_model in model_options else []
+        default=[default_model] if default_model in model_options else [],
+        format_func=format_model_option
     )
 
     # Generate button
     if st.button('Generate', use_container_width=True):
         if prompt and selected_model_titles:
-            st.markdown(prompt)
-            selected_models = [model for model in models if model['title'] in selected_model_titles]
+            selected_models = catalog.select_models(selected_model_titles)
 
             # Process selected style
-            selected_style_prefix = next(style['prompt_prefix'] for style in image_styles if style['name'] == selected_style)
+            selected_style_prefix = catalog.style(selected_style)['prompt_prefix']
             
             # Combine style prefix with the user's prompt
             if selected_style != "סגנון חופשי" and selected_style_prefix:
@@ -350,27 +242,20 @@ async def main():
             else:
                 full_prompt = prompt
 
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-
-            # Create a placeholder for the spinner
-            with st.spinner("מייצר תמונות נא להמתין בסבלנות ..."):
-                html_content = generate_html(prompt, full_prompt, selected_models, progress_bar, status_text)
-
-                # Provide a download link for the HTML content
-                bio = BytesIO(html_content.encode('utf-8'))
-                
-                download_link = get_binary_file_downloader_html(bio, 'comparison_results.html')
-                st.markdown(download_link, unsafe_allow_html=True)
-
-                # Display the HTML content directly in Streamlit
-                st.components.v1.html(html_content, height=600, scrolling=True)
-
-                # Send message to Telegram
-                try:
-                    await send_telegram_message_and_file(full_prompt, html_content)
-                except Exception as e:
-                    print(f"Failed to send to Telegram: {str(e)}")
+            # Generation runs on the shared job workers, so reruns neither block nor repeat it.
+            # The job id is kept in the URL too, so the result survives a page reload.
+            job_id = get_job_queue().submit({
+                'prompt': prompt,
+                'full_prompt': full_prompt,
+                'style_prefix': selected_style_prefix,
+                'models': selected_models,
+            }, models=selected_models)
+            st.session_state.job_id = job_id
+            st.query_params['job'] = job_id
+
+    job_id = st.session_state.get('job_id') or st.query_params.get('job')
+    if job_id:
+        show_job(job_id)
 
     # dISPLAY models_comparison_template.html
     # ADD examples.py
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Add the project root (the parent of 'tests') to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
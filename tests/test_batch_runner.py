@@ -0,0 +1,91 @@
+import os
+import json
+import asyncio
+
+import pytest
+
+from utils import batch_runner
+from utils.batch_runner import BatchRunner, cell_status
+from utils.generation_engine import TIMED_OUT
+from utils.imgur_uploader import NO_IMAGE_URL
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MODELS = [
+    {'title': "Flux", 'generation_app': "flux"},
+    {'title': "Upload fails", 'generation_app': "flux"},
+    {'title': "Slow", 'generation_app': "flux"},
+]
+
+class FakeRegistry:
+    async def prepare(self, models):
+        pass
+
+class FakeEngine:
+    """Answers each model from results, and remembers which models it was asked for."""
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    async def run(self, prompt, models, generate, store=None, key=None):
+        for model in models:
+            self.calls.append(model['title'])
+            yield model, self.results[model['title']]
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = FakeEngine({})
+
+    async def translate(text):
+        return text
+    monkeypatch.chdir(PROJECT_ROOT)
+    monkeypatch.setattr(batch_runner, "translate_to_english", translate)
+    monkeypatch.setattr(batch_runner, "get_generator_registry", FakeRegistry)
+    monkeypatch.setattr(batch_runner, "get_generation_engine", lambda: engine)
+    return engine
+
+def run_batch(tmp_path):
+    runner = BatchRunner(["a cat", "a dog"], MODELS, output_dir=str(tmp_path), run_name="run")
+    return runner, asyncio.run(runner.run())
+
+def test_cell_status():
+    assert cell_status("https://i.imgur.com/x.png") == 'ok'
+    assert cell_status(NO_IMAGE_URL) == 'failed'
+    assert cell_status(None) == 'failed'
+    assert cell_status(TIMED_OUT) == 'timed_out'
+
+def test_resume_retries_only_unfinished_cells(tmp_path, engine):
+    engine.results = {"Flux": "https://i.imgur.com/flux.png", "Upload fails": NO_IMAGE_URL, "Slow": TIMED_OUT}
+    runner, manifest = run_batch(tmp_path)
+    assert sorted(engine.calls) == sorted([model['title'] for model in MODELS] * 2)
+    statuses = {result['model']: result['status'] for result in manifest['prompts'][0]['results']}
+    assert statuses == {"Flux": 'ok', "Upload fails": 'failed', "Slow": 'timed_out'}
+    pages = {prompt['file'] for prompt in manifest['prompts']}
+
+    engine.calls = []
+    engine.results = {"Upload fails": "https://i.imgur.com/retried.png", "Slow": "https://i.imgur.com/slow.png"}
+    runner, manifest = run_batch(tmp_path)
+    assert sorted(engine.calls) == ["Slow", "Slow", "Upload fails", "Upload fails"]
+    assert all(result['status'] == 'ok' for prompt in manifest['prompts'] for result in prompt['results'])
+    # The pages of the first run are rewritten in place
+    assert {prompt['file'] for prompt in manifest['prompts']} == pages
+
+    engine.calls = []
+    run_batch(tmp_path)
+    assert engine.calls == []
+
+def test_upload_failures_marked_ok_by_older_checkpoints_are_retried(tmp_path, engine):
+    run_dir = tmp_path / "run"
+    run_dir.mkdir()
+    with open(run_dir / "checkpoint.jsonl", "w", encoding="utf-8") as file:
+        for title, media_url in [("Flux", "https://i.imgur.com/flux.png"), ("Upload fails", NO_IMAGE_URL)]:
+            file.write(json.dumps({'type': 'cell', 'prompt_index': 0, 'model': title,
+                                   'english_prompt': "a cat", 'media_url': media_url, 'status': 'ok'}) + "\n")
+        # Cut short by an interrupted run
+        file.write('{"type": "cell", "prompt_in')
+    engine.results = {title: f"https://i.imgur.com/{index}.png" for index, title in enumerate(m['title'] for m in MODELS)}
+    run_batch(tmp_path)
+    assert sorted(engine.calls) == ["Flux", "Slow", "Slow", "Upload fails", "Upload fails"]
+
+    engine.calls = []
+    run_batch(tmp_path)
+    assert engine.calls == []
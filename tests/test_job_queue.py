@@ -0,0 +1,110 @@
+import time
+import sqlite3
+import threading
+
+import pytest
+
+from utils.job_queue import JobQueue, QUEUED, RUNNING, DONE
+
+LEASE = 0.6
+
+class Handler:
+    """Records the jobs it runs; blocks until released if block is set."""
+    def __init__(self, block=False):
+        self.calls = []
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    async def __call__(self, payload, reporter):
+        self.calls.append(payload['name'])
+        while not self.release.is_set():
+            time.sleep(0.02)
+        return f"<p>{payload['name']}</p>"
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+def wait_for_status(queue, job_id, status, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job.status == status:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} is {queue.get(job_id).status}, not {status}")
+
+def insert_running(path, job_id, owner, lease_until, updated_at):
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, status, payload, models, progress, status_text, created_at, updated_at, owner, lease_until) "
+            "VALUES (?, ?, ?, '[]', 0, '', ?, ?, ?, ?)",
+            (job_id, RUNNING, '{"name": "%s"}' % job_id, updated_at, updated_at, owner, lease_until)
+        )
+
+def test_start_leaves_jobs_of_a_live_queue_alone(path):
+    first_handler, second_handler = Handler(block=True), Handler()
+    first = JobQueue(first_handler, path=path, workers=1, lease=LEASE)
+    first.start()
+    job_id = first.submit({'name': "first"})
+    wait_for_status(first, job_id, RUNNING)
+
+    second = JobQueue(second_handler, path=path, workers=1, lease=LEASE)
+    second.start()
+    # Several leases long: the heartbeat keeps renewing it
+    time.sleep(LEASE * 3)
+    assert second.get(job_id).status == RUNNING
+    assert second_handler.calls == []
+
+    first_handler.release.set()
+    wait_for_status(first, job_id, DONE)
+    assert first_handler.calls == ["first"]
+
+def test_start_requeues_expired_leases(path):
+    JobQueue(Handler(), path=path, lease=LEASE)  # creates the table
+    now = time.time()
+    insert_running(path, "expired", "dead:1:x", now - 1, now - 10)
+    insert_running(path, "alive", "other:2:y", now + 3600, now)
+
+    queue = JobQueue(Handler(block=True), path=path, workers=1, lease=LEASE)
+    assert queue._recover() == 1
+    assert queue.get("expired").status == QUEUED
+    assert queue.get("alive").status == RUNNING
+
+def test_jobs_from_before_leases_are_requeued_once_stale(path):
+    JobQueue(Handler(), path=path, lease=LEASE)
+    now = time.time()
+    insert_running(path, "stale", None, None, now - 10)
+    insert_running(path, "recent", None, None, now)
+
+    handler = Handler()
+    queue = JobQueue(handler, path=path, workers=1, lease=LEASE)
+    queue.start()
+    wait_for_status(queue, "stale", DONE)
+    assert queue.get("recent").status == RUNNING
+    assert handler.calls == ["stale"]
+
+def test_jobs_of_a_stopped_queue_are_taken_over(path):
+    now = time.time()
+    JobQueue(Handler(), path=path, lease=LEASE)
+    insert_running(path, "orphan", "dead:1:x", now + LEASE, now)
+
+    handler = Handler()
+    queue = JobQueue(handler, path=path, workers=1, lease=LEASE)
+    queue.start()
+    assert queue.get("orphan").status == RUNNING
+    # Picked up by the heartbeat once the lease runs out, without a restart
+    wait_for_status(queue, "orphan", DONE)
+    assert handler.calls == ["orphan"]
+
+def test_older_databases_get_the_lease_columns(path):
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT, payload TEXT, models TEXT, progress REAL, "
+            "status_text TEXT, result TEXT, error TEXT, created_at REAL, updated_at REAL)"
+        )
+    queue = JobQueue(Handler(), path=path, workers=1, lease=LEASE)
+    queue.start()
+    job_id = queue.submit({'name': "new"})
+    assert wait_for_status(queue, job_id, DONE).result == "<p>new</p>"
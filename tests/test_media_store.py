@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+from utils.media_store import LocalMediaStore
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalMediaStore(root=str(tmp_path / "generated"), base_url="/app/static/generated/")
+
+def test_read_returns_saved_media(store):
+    url = asyncio.run(store.save(b"image bytes", "image", content_type="image/png"))
+    assert url.startswith("/app/static/generated/") and url.endswith(".png")
+    assert asyncio.run(store.read(url)) == b"image bytes"
+
+def test_path_rejects_other_urls(store):
+    assert store.path("https://i.imgur.com/abc.png") is None
+    assert store.path("/app/static/other/abc.png") is None
+
+def test_path_stays_in_the_root(store):
+    assert store.path("/app/static/generated/../../secret.txt") == store.path("/app/static/generated/secret.txt")
+
+def test_read_rejects_other_urls(store):
+    with pytest.raises(ValueError):
+        asyncio.run(store.read("https://i.imgur.com/abc.png"))
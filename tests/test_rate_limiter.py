@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from utils.rate_limiter import RateLimiter, parse_rate_limit, parse_retry_after, parse_reset, parse_remaining
+
+@pytest.fixture
+def limiter():
+    return RateLimiter({'imgur': "10/1"})
+
+def test_parse_rate_limit():
+    assert parse_rate_limit("60/60") == (1.0, 60)
+    assert parse_rate_limit("5") == (5.0, 5)
+    assert parse_rate_limit("") is None
+    assert parse_rate_limit("0/60") is None
+
+@pytest.mark.parametrize("value, expected", [("12", 12), ("12.9", 12), ("0", 0), ("-1", -1),
+                                             ("", None), (None, None), ("abc", None), ("inf", None), ("nan", None)])
+def test_parse_remaining(value, expected):
+    assert parse_remaining(value) == expected
+
+def test_parse_retry_after():
+    assert parse_retry_after("30") == 30
+    assert parse_retry_after("-5") == 0
+    assert parse_retry_after("inf") is None
+    assert parse_retry_after("soon") is None
+    assert 50 < parse_retry_after(time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 60))) <= 60
+
+def test_parse_reset():
+    assert parse_reset("30") == 30
+    assert 25 < parse_reset(str(time.time() + 30)) <= 30
+    assert parse_reset("nan") is None
+    assert parse_reset("next hour") is None
+
+def test_observe_skips_malformed_headers(limiter):
+    headers = {'X-RateLimit-ClientRemaining': "lots", 'X-RateLimit-UserRemaining': "7", 'X-RateLimit-Remaining': ""}
+    assert limiter.observe('imgur', None, 200, headers) is None
+    assert limiter.bucket('imgur').remaining == 7
+
+def test_observe_with_only_malformed_headers(limiter):
+    assert limiter.observe('imgur', None, 200, {'X-RateLimit-Remaining': "n/a", 'X-RateLimit-Reset': "n/a"}) is None
+    assert limiter.bucket('imgur').remaining is None
+
+def test_observe_429_pauses_for_retry_after(limiter):
+    assert limiter.observe('imgur', None, 429, {'Retry-After': "2"}) == 2
+    bucket = limiter.bucket('imgur')
+    assert bucket.throttled == 1
+    assert bucket.reserve() >= 1.9
+
+def test_observe_429_with_malformed_retry_after_uses_the_default(limiter):
+    assert limiter.observe('imgur', None, 429, {'Retry-After': "later"}) == 10
+
+def test_observe_used_up_quota_waits_for_the_reset(limiter):
+    assert limiter.observe('imgur', None, 200, {'X-RateLimit-Remaining': "0", 'X-RateLimit-Reset': "5"}) == 5
+
+def test_unlimited_provider_is_not_observed(limiter):
+    assert limiter.observe('pollinations', None, 429, {'Retry-After': "2"}) is None
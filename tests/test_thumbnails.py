@@ -0,0 +1,84 @@
+import os
+import time
+
+import pytest
+from PIL import Image
+
+from utils.thumbnails import ThumbnailCache, picture_html
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "example.png"
+    Image.new("RGB", (400, 300), "purple").save(path)
+    return str(path)
+
+@pytest.fixture
+def cache(tmp_path):
+    return ThumbnailCache(root=str(tmp_path / "thumbnails"), widths=[100, 200], formats=["webp"])
+
+def signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+def wait_for(cache, source_path, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        derivatives = cache.lookup(source_path, *signature(source_path))
+        if derivatives is not None:
+            return derivatives
+        time.sleep(0.05)
+    raise AssertionError(f"{source_path} was not built in {timeout}s")
+
+def test_lookup_miss_builds_in_background(cache, source):
+    assert cache.lookup(source, *signature(source)) is None
+    derivatives = wait_for(cache, source)
+    assert [width for width, _ in derivatives['sources']['webp']] == [100, 200]
+    assert (derivatives['width'], derivatives['height']) == (400, 300)
+
+def test_lookup_reads_no_files(cache, source, monkeypatch):
+    cache.get(source)
+    mtime, size = signature(source)
+
+    def no_io(*args, **kwargs):
+        raise AssertionError("lookup() touched the filesystem")
+    monkeypatch.setattr(os, "stat", no_io)
+    monkeypatch.setattr(os.path, "exists", no_io)
+    assert cache.lookup(source, mtime, size) is not None
+
+def test_lookup_of_a_changed_source_misses(cache, source):
+    cache.get(source)
+    mtime, size = signature(source)
+    assert cache.lookup(source, mtime, size + 1) is None
+
+def test_manifest_drops_entries_whose_files_are_gone(cache, source, tmp_path):
+    derivatives = cache.get(source)
+    os.remove(os.path.join(cache.root, derivatives['sources']['webp'][0][1].rsplit('/', 1)[-1]))
+    reloaded = ThumbnailCache(root=cache.root, widths=[100, 200], formats=["webp"])
+    assert reloaded.lookup(source, *signature(source)) is None
+    assert wait_for(reloaded, source) == derivatives
+
+def test_get_rebuilds_deleted_files(cache, source):
+    derivatives = cache.get(source)
+    for name in os.listdir(cache.root):
+        if name.endswith(".webp"):
+            os.remove(os.path.join(cache.root, name))
+    assert cache.get(source) == derivatives
+    assert all(os.path.exists(os.path.join(cache.root, url.rsplit('/', 1)[-1]))
+               for _, url in derivatives['sources']['webp'])
+
+def test_unreadable_source_is_not_queued_again(cache, tmp_path):
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+    assert cache.get(str(broken)) is None
+    assert cache.lookup(str(broken), *signature(str(broken))) is None
+    assert str(broken) not in cache._pending
+
+def test_without_formats_nothing_is_built(tmp_path, source):
+    cache = ThumbnailCache(root=str(tmp_path / "thumbnails"), formats=["bmp"])
+    assert cache.formats == []
+    assert cache.get(source) is None
+    assert cache.lookup(source, *signature(source)) is None
+
+def test_picture_html_without_sources_falls_back_to_the_original():
+    derivatives = {'full_url': "/full.png", 'poster': False, 'width': 10, 'height': 10, 'sources': {'webp': []}}
+    assert '<img src="/full.png"' in picture_html(derivatives, "alt")
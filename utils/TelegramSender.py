@@ -1,40 +1,61 @@
 import os
-from dotenv import load_dotenv
+import json
 import asyncio
 import aiohttp
-from typing import Optional
+from typing import Optional, List
 from io import BytesIO
 
+from utils.config import load_config
+from utils.rate_limiter import get_rate_limiter
+
 # Load environment variables from .env file
-load_dotenv()
+load_config()
 
 class TelegramSender:
-    def __init__(self):
+    def __init__(self, http_client=None):
+        """
+        :param http_client: Optional HttpClient whose long-lived session is used for every
+            request, instead of a session owned (and closed) by this sender.
+        """
         self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
         self.chat_id = os.getenv("TELEGRAM_CHAT_ID")
         if not self.bot_token or not self.chat_id:
             raise ValueError("TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID must be set in environment variables")
-        self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
+        self.base_url = f"{os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')}/bot{self.bot_token}"
+        self.http = http_client
         self.session = None
         # print(self.bot_token)
 
     async def ensure_session(self):
-        if self.session is None or self.session.closed:
+        if self.http is not None:
+            self.session = self.http.session
+        elif self.session is None or self.session.closed:
             self.session = aiohttp.ClientSession()
 
     async def close_session(self):
-        if self.session and not self.session.closed:
+        # A shared session stays open for the next send
+        if self.http is None and self.session and not self.session.closed:
             await self.session.close()
 
-    async def _make_request(self, method: str, endpoint: str, **kwargs):
+    async def _make_request(self, method: str, endpoint: str, attempts: int = 3, **kwargs):
         await self.ensure_session()
         url = f"{self.base_url}/{endpoint}"
-        async with getattr(self.session, method)(url, **kwargs) as response:
-            if response.status != 200:
-                print(f"Failed to {endpoint}. Status: {response.status}")
-                print(f"Response: {await response.text()}")
-                return None
-            return await response.json()
+        rate_limiter = get_rate_limiter()
+        if isinstance(kwargs.get('data'), aiohttp.FormData):
+            # A form can only be sent once
+            attempts = 1
+        for attempt in range(attempts):
+            # Telegram sends Retry-After with its 429s; the rate limiter holds the next attempt back until then
+            await rate_limiter.acquire('telegram', self.bot_token)
+            async with getattr(self.session, method)(url, **kwargs) as response:
+                rate_limiter.observe('telegram', self.bot_token, response.status, response.headers)
+                if response.status == 429 and attempt < attempts - 1:
+                    continue
+                if response.status != 200:
+                    print(f"Failed to {endpoint}. Status: {response.status}")
+                    print(f"Response: {await response.text()}")
+                    return None
+                return await response.json()
 
     async def verify_bot_token(self):
         result = await self._make_request('get', 'getMe')
@@ -55,6 +76,16 @@ class TelegramSender:
             print("Photo sent successfully to Telegram")
         return result
 
+    async def send_photo_url(self, photo_url: str, caption: Optional[str] = None):
+        params = {"chat_id": self.chat_id, "photo": photo_url}
+        if caption:
+            params["caption"] = caption
+
+        result = await self._make_request('post', 'sendPhoto', params=params)
+        if result:
+            print("Photo sent successfully to Telegram")
+        return result
+
     async def send_message(self, text: str, title: Optional[str] = None) -> None:
         params = {
             "chat_id": self.chat_id,
@@ -67,6 +98,7 @@ class TelegramSender:
         result = await self._make_request('post', 'sendMessage', params=params)
         if result:
             print("Message sent successfully")
+        return result
 
     async def send_image_and_text(self, image_path: str, caption: Optional[str] = None) -> None:
         data = aiohttp.FormData()
@@ -90,17 +122,47 @@ class TelegramSender:
         if result:
             print("Document sent successfully")
             
-    async def send_document(self, document: BytesIO, caption: Optional[str] = None) -> None:
+    async def send_document(self, document: BytesIO, caption: Optional[str] = None,
+                            filename: str = "comparison_results.html", content_type: str = "text/html") -> None:
         data = aiohttp.FormData()
         data.add_field("chat_id", self.chat_id)
-        data.add_field("document", document, filename="comparison_results.html", content_type="text/html")
+        data.add_field("document", document, filename=filename, content_type=content_type)
         if caption:
             data.add_field("caption", caption)
 
         result = await self._make_request('post', 'sendDocument', data=data)
         if result:
             print("Document sent successfully")
-            
+        return result
+
+    async def send_media_group(self, items: List[dict]):
+        """
+        Sends 2-10 photos, or 2-10 documents, as a single album.
+
+        :param items: Dicts with 'type' ("photo" or "document"), 'media' (a URL, or the
+            bytes to upload), and optional 'filename', 'content_type' and 'caption'.
+        """
+        data = aiohttp.FormData()
+        data.add_field("chat_id", self.chat_id)
+        media = []
+        for i, item in enumerate(items):
+            entry = {'type': item['type']}
+            if isinstance(item['media'], str):
+                entry['media'] = item['media']
+            else:
+                entry['media'] = f"attach://file{i}"
+                data.add_field(f"file{i}", item['media'], filename=item.get('filename', f"file{i}"),
+                               content_type=item.get('content_type'))
+            if item.get('caption'):
+                entry['caption'] = item['caption']
+            media.append(entry)
+        data.add_field("media", json.dumps(media, ensure_ascii=False))
+
+        result = await self._make_request('post', 'sendMediaGroup', data=data)
+        if result:
+            print(f"Media group of {len(items)} sent successfully")
+        return result
+
 # Example usage
 async def main():
     sender = TelegramSender()
@@ -0,0 +1,275 @@
+import os
+import re
+import sys
+import json
+import uuid
+import asyncio
+import argparse
+import functools
+import hashlib
+from datetime import datetime
+from typing import List
+
+# Add the project root (the parent of 'utils') to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.config import load_config
+from utils.comparison import generate_media, store_media, record_result, stream_comparison, translate_to_english
+from utils.generation_engine import get_generation_engine, TIMED_OUT
+from utils.generator_registry import get_generator_registry
+from utils.result_cache import make_cache_key
+from utils.offline_export import get_offline_exporter
+from utils.catalog import get_catalog
+from utils.imgur_uploader import NO_IMAGE_URL
+
+# Load environment variables from .env file
+load_config()
+
+# 'Label: "prompt"' lines, as in "examples for prompts.txt"
+LABELED_PROMPT = re.compile(r'^[^"]{1,60}:\s*"(.+)"$')
+
+def load_prompts(path: str) -> List[str]:
+    """
+    Reads prompts from a JSON file (a list of strings, or of objects with a "prompt", like
+    data/Examples.json) or a text file with one prompt per line.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        if path.lower().endswith(".json"):
+            items = json.load(file)
+            return [item['prompt'] if isinstance(item, dict) else item for item in items]
+        prompts = []
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            match = LABELED_PROMPT.match(line)
+            prompts.append(match.group(1) if match else line)
+        return prompts
+
+def load_models(titles: List[str] = None) -> List[dict]:
+    catalog = get_catalog()
+    return catalog.select_models(titles) if titles else catalog.models
+
+def load_style_prefix(style_name: str = None) -> str:
+    if not style_name:
+        return ""
+    style = get_catalog().style(style_name)
+    if style is None:
+        raise ValueError(f"Unknown style: {style_name}")
+    return style['prompt_prefix']
+
+def cell_status(media_url) -> str:
+    """A cell's checkpoint status. Failed uploads come back as NO_IMAGE_URL and are retried like failures."""
+    if media_url is TIMED_OUT:
+        return 'timed_out'
+    return 'failed' if media_url in (None, NO_IMAGE_URL) else 'ok'
+
+def comparison_file_name() -> str:
+    """Named like the pages in output/, e.g. 2024_08_25_16_27_07_cbc0d0.html"""
+    return f"{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}_{uuid.uuid4().hex[:6]}.html"
+
+class BatchRunner:
+    """
+    Runs every prompt in a prompt set against every selected model and writes one
+    comparison page per prompt, plus a manifest.json describing the whole run.
+
+    Each finished cell of the prompts x models matrix is appended to checkpoint.jsonl in
+    the run folder. Running the same batch again resumes it: successful cells and
+    written pages are kept, failed and missing cells are generated again.
+
+    Concurrency is bounded by the generation engine's global and per-provider limits,
+    and by prompt_concurrency prompts in flight at a time.
+
+    With export_mode ("inline" or "zip"), each page also gets an offline copy with its
+    media embedded (see OfflineExporter), written next to it.
+    """
+    def __init__(self, prompts: List[str], models: List[dict], output_dir: str = "output", run_name: str = None,
+                 style_name: str = None, prompt_concurrency: int = None, prompt_file: str = None,
+                 export_mode: str = None):
+        self.prompts = prompts
+        self.export_mode = export_mode
+        self.models = models
+        self.style_name = style_name
+        self.style_prefix = load_style_prefix(style_name)
+        self.prompt_file = prompt_file
+        self.prompt_concurrency = prompt_concurrency or int(os.getenv("BATCH_PROMPT_CONCURRENCY", 2))
+        self.run_dir = os.path.join(output_dir, run_name or f"batch_{self.fingerprint()}")
+        self.checkpoint_path = os.path.join(self.run_dir, "checkpoint.jsonl")
+        self.manifest_path = os.path.join(self.run_dir, "manifest.json")
+        self.cells = {}  # (prompt index, model title) -> checkpoint record
+        self.pages = {}  # prompt index -> checkpoint record
+        self._checkpoint_file = None
+
+    def fingerprint(self) -> str:
+        """Identifies a batch by its prompts, models and style, so reruns find their checkpoint."""
+        key = json.dumps([self.prompts, [model['title'] for model in self.models], self.style_name], ensure_ascii=False)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by an interrupted run
+                    continue
+                if record['type'] == 'cell':
+                    self.cells[(record['prompt_index'], record['model'])] = record
+                elif record['type'] == 'page':
+                    self.pages[record['prompt_index']] = record
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.checkpoint_path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def _checkpoint(self, record):
+        self._checkpoint_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._checkpoint_file.flush()
+        os.fsync(self._checkpoint_file.fileno())
+        key = record['prompt_index']
+        if record['type'] == 'cell':
+            self.cells[(key, record['model'])] = record
+        else:
+            self.pages[key] = record
+
+    def _is_done(self, prompt_index, model):
+        record = self.cells.get((prompt_index, model['title']))
+        # Checkpoints written before failed uploads were told apart have them as 'ok'
+        return record is not None and record['status'] == 'ok' and record.get('media_url') != NO_IMAGE_URL
+
+    async def _run_prompt(self, prompt_index, slots):
+        prompt = self.prompts[prompt_index]
+        pending = [model for model in self.models if not self._is_done(prompt_index, model)]
+        if not pending and prompt_index in self.pages:
+            return
+        async with slots:
+            if pending:
+                full_prompt = f"{self.style_prefix} {prompt}" if self.style_prefix else prompt
+                english_prompt, _ = await asyncio.gather(
+                    translate_to_english(full_prompt),
+                    get_generator_registry().prepare(pending)
+                )
+                generate = functools.partial(generate_media, style=self.style_prefix)
+                store = functools.partial(store_media, style=self.style_prefix)
+                key = functools.partial(make_cache_key, style=self.style_prefix)
+                async for model, media_url in get_generation_engine().run(english_prompt, pending, generate, store, key=key):
+                    status = cell_status(media_url)
+                    self._checkpoint({
+                        'type': 'cell', 'prompt_index': prompt_index, 'model': model['title'],
+                        'english_prompt': english_prompt, 'media_url': media_url if status == 'ok' else None,
+                        'status': status,
+                    })
+                    print(f"[{prompt_index + 1}/{len(self.prompts)}] {model['title']}: {status}")
+            self._write_page(prompt_index)
+            if self.export_mode:
+                await self._export_page(prompt_index)
+
+    def _page_models(self, prompt_index):
+        models = []
+        for model in self.models:
+            record = self.cells.get((prompt_index, model['title']), {})
+            model = dict(model)
+            record_result(model, TIMED_OUT if record.get('status') == 'timed_out' else record.get('media_url'))
+            models.append(model)
+        return models
+
+    def _write_page(self, prompt_index):
+        models = self._page_models(prompt_index)
+        page = self.pages.get(prompt_index)
+        file_name = page['file'] if page else comparison_file_name()
+        # Written as the template renders, without holding the whole page
+        with open(os.path.join(self.run_dir, file_name), "wb") as file:
+            file.writelines(stream_comparison(self.prompts[prompt_index], models))
+        if not page:
+            self._checkpoint({'type': 'page', 'prompt_index': prompt_index, 'file': file_name})
+
+    async def _export_page(self, prompt_index):
+        result = await get_offline_exporter().export(
+            self.prompts[prompt_index], self._page_models(prompt_index), mode=self.export_mode
+        )
+        base_name = os.path.splitext(self.pages[prompt_index]['file'])[0]
+        extension = ".zip" if self.export_mode == "zip" else "_offline.html"
+        with open(os.path.join(self.run_dir, base_name + extension), "wb") as file:
+            file.write(result.data)
+
+    def _write_manifest(self):
+        prompts = []
+        for prompt_index, prompt in enumerate(self.prompts):
+            results = []
+            for model in self.models:
+                record = self.cells.get((prompt_index, model['title']), {})
+                results.append({
+                    'model': model['title'],
+                    'generation_app': model['generation_app'],
+                    'media_url': record.get('media_url'),
+                    'status': record.get('status', 'pending'),
+                })
+            page = self.pages.get(prompt_index)
+            english_prompts = [
+                self.cells.get((prompt_index, model['title']), {}).get('english_prompt') for model in self.models
+            ]
+            prompts.append({
+                'index': prompt_index,
+                'prompt': prompt,
+                'english_prompt': next(filter(None, english_prompts), None),
+                'file': page['file'] if page else None,
+                'results': results,
+            })
+        manifest = {
+            'prompt_file': self.prompt_file,
+            'style': self.style_name,
+            'models': [model['title'] for model in self.models],
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'prompts': prompts,
+        }
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.manifest_path)
+        return manifest
+
+    async def run(self) -> dict:
+        """Runs (or resumes) the batch. Returns the manifest."""
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._load_checkpoint()
+        done = sum(1 for prompt_index, title in self.cells if self._is_done(prompt_index, {'title': title}))
+        if done:
+            print(f"Resuming {self.run_dir}: {done}/{len(self.prompts) * len(self.models)} results already done")
+        slots = asyncio.Semaphore(self.prompt_concurrency)
+        with open(self.checkpoint_path, "a", encoding="utf-8") as self._checkpoint_file:
+            if self._checkpoint_file.tell() and not self._ends_with_newline():
+                # Start after a line cut short by an interrupted run, not on it
+                self._checkpoint_file.write("\n")
+            try:
+                await asyncio.gather(*(self._run_prompt(prompt_index, slots) for prompt_index in range(len(self.prompts))))
+            finally:
+                manifest = self._write_manifest()
+        return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare models over a whole prompt set, without the Streamlit app.")
+    parser.add_argument("prompt_file", help='A JSON prompt list (e.g. data/Examples.json) or a text file, one prompt per line')
+    parser.add_argument("--models", nargs="+", help="Model titles from data/models.json (default: every model)")
+    parser.add_argument("--style", help="A style name from data/image_styles.json")
+    parser.add_argument("--output-dir", default="output")
+    parser.add_argument("--run-name", help="Folder for this run inside the output folder (default: derived from the inputs)")
+    parser.add_argument("--prompt-concurrency", type=int, help="Prompts generated at the same time")
+    parser.add_argument("--export", choices=["inline", "zip"],
+                        help="Also write an offline copy of each page: one HTML file with the media inlined, or a ZIP")
+    args = parser.parse_args()
+
+    runner = BatchRunner(
+        load_prompts(args.prompt_file), load_models(args.models), output_dir=args.output_dir,
+        run_name=args.run_name, style_name=args.style, prompt_concurrency=args.prompt_concurrency,
+        prompt_file=args.prompt_file, export_mode=args.export
+    )
+    manifest = asyncio.run(runner.run())
+    results = [result for prompt in manifest['prompts'] for result in prompt['results']]
+    succeeded = sum(1 for result in results if result['status'] == 'ok')
+    print(f"{succeeded}/{len(results)} results, manifest: {runner.manifest_path}")
+
+if __name__ == "__main__":
+    main()
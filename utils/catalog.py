@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import threading
+from typing import List, Optional
+
+from utils.config import load_config
+
+# Load environment variables from .env file
+load_config()
+
+# The files the app is configured by, by catalog entry. data/models.json and
+# data/image_styles.json are the catalog of record; data/models_and_styles.json is only
+# read by the old "main copy.py" and is not part of it.
+CATALOG_FILES = {
+    'models': os.path.join("data", "models.json"),
+    'styles': os.path.join("data", "image_styles.json"),
+    'examples': os.path.join("data", "Examples.json"),
+    'expander': "expander.html",
+    'header': os.path.join("utils", "header.md"),
+    'css': os.path.join("utils", "styles.css"),
+    'footer': os.path.join("utils", "footer.md"),
+}
+MEDIA_TYPES = ('image', 'video')
+
+class CatalogError(ValueError):
+    """A catalog file is missing, malformed or inconsistent."""
+
+def _require(condition, path, message):
+    if not condition:
+        raise CatalogError(f"{path}: {message}")
+
+def _index(items, key, path, kind) -> dict:
+    """Maps each item's key to its position, rejecting duplicates."""
+    index = {}
+    for position, item in enumerate(items):
+        _require(isinstance(item, dict) and isinstance(item.get(key), str) and item[key],
+                 path, f"{kind} {position} has no {key}")
+        _require(item[key] not in index, path, f"duplicate {kind} {key} {item[key]!r}")
+        index[item[key]] = position
+    return index
+
+def _load_models(path, text):
+    models = json.loads(text)["models"]
+    _require(isinstance(models, list) and models, path, "expected a non-empty \"models\" list")
+    titles = _index(models, 'title', path, "model")
+    by_app = {}
+    for model in models:
+        _require(isinstance(model.get('generation_app'), str), path, f"model {model['title']!r} has no generation_app")
+        _require(model.get('media_type', 'image') in MEDIA_TYPES, path,
+                 f"model {model['title']!r} has media_type {model.get('media_type')!r}")
+        _require(isinstance(model.get('timeout', 0), (int, float)), path, f"model {model['title']!r} has a non-numeric timeout")
+        by_app.setdefault(model['generation_app'], []).append(model)
+    return {'models': models, 'model_titles': titles, 'models_by_app': by_app}
+
+def _load_styles(path, text):
+    styles = json.loads(text)["styles"]
+    _require(isinstance(styles, list) and styles, path, "expected a non-empty \"styles\" list")
+    names = _index(styles, 'name', path, "style")
+    for style in styles:
+        _require(isinstance(style.get('prompt_prefix'), str), path, f"style {style['name']!r} has no prompt_prefix")
+    return {'styles': styles, 'style_names': names}
+
+def _load_examples(path, text):
+    examples = json.loads(text)
+    _require(isinstance(examples, list), path, "expected a list of examples")
+    titles = _index(examples, 'title', path, "example")
+    for example in examples:
+        _require(isinstance(example.get('prompt'), str), path, f"example {example['title']!r} has no prompt")
+    return {'examples': examples, 'example_titles': titles}
+
+def _load_header(path, text):
+    # The first line is the title; the first markdown image, if any, is the header image
+    lines = text.split('\n')
+    image_path = next((line.split('(')[1].split(')')[0] for line in lines if line.startswith('![')), None)
+    return {'header': text, 'title': lines[0].strip('# '), 'image_path': image_path}
+
+# How each file is parsed into catalog entries. Text files are taken as they are.
+LOADERS = {
+    'models': _load_models,
+    'styles': _load_styles,
+    'examples': _load_examples,
+    'header': _load_header,
+}
+
+class Catalog:
+    """
+    The models, styles and example prompts, and the page's header, footer, expander and
+    CSS, read once, validated and indexed for O(1) lookups by model title, generation
+    app, style name and example title.
+
+    At most every check_interval seconds, each file is stat'ed; a file whose mtime or
+    size changed is read and validated again, and the catalog is swapped for the new one
+    as a whole. An edit that fails validation is reported and the previous version kept,
+    so a half-saved file never takes the app down. The JSON catalogs are required; a
+    missing text file is served as empty and listed in missing.
+
+    The returned dicts and lists are shared: copy a model before filling it in.
+    """
+    def __init__(self, files: dict = None, check_interval: float = None):
+        self.files = {**CATALOG_FILES, **(files or {})}
+        self.check_interval = check_interval if check_interval is not None else float(os.getenv("CATALOG_CHECK_INTERVAL", 2))
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._stats = {}
+        self._entries = {}
+        self.missing = set()
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False):
+        """Reloads the files that changed since the last check. Cheap when none did."""
+        if not force and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            entries, stats, missing = dict(self._entries), dict(self._stats), set(self.missing)
+            for name, path in self.files.items():
+                try:
+                    stat = os.stat(path)
+                    signature = (stat.st_mtime, stat.st_size)
+                except OSError:
+                    signature = None
+                if not force and name in stats and stats[name] == signature:
+                    continue
+                try:
+                    entries.update(self._load(name, path, signature))
+                    stats[name] = signature
+                    if signature is None:
+                        missing.add(name)
+                    else:
+                        missing.discard(name)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    if not self._entries:
+                        # Nothing to fall back on at startup
+                        raise CatalogError(f"Could not load {path}: {str(e)}") from e
+                    print(f"Keeping the previous {name} catalog, {path} is invalid: {str(e)}")
+                    stats[name] = signature
+            # Swapped at once, so readers see either the old or the new catalog
+            self._entries, self._stats, self.missing = entries, stats, missing
+            self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _load(name, path, signature) -> dict:
+        if signature is None:
+            if name in LOADERS and name != 'header':
+                raise CatalogError(f"{path} is missing")
+            text = ""
+        else:
+            with open(path, "r", encoding="utf-8") as file:
+                text = file.read()
+        loader = LOADERS.get(name)
+        return loader(path, text) if loader else {name: text}
+
+    def _snapshot(self) -> dict:
+        # One consistent version of every entry, even if a reload swaps them meanwhile
+        self.refresh()
+        return self._entries
+
+    @property
+    def models(self) -> List[dict]:
+        return self._snapshot()['models']
+
+    @property
+    def model_titles(self) -> List[str]:
+        return list(self._snapshot()['model_titles'])
+
+    def model(self, title: str) -> Optional[dict]:
+        entries = self._snapshot()
+        position = entries['model_titles'].get(title)
+        return None if position is None else entries['models'][position]
+
+    def select_models(self, titles: List[str]) -> List[dict]:
+        """The models with these titles, in catalog order. Unknown titles raise CatalogError."""
+        entries = self._snapshot()
+        positions = entries['model_titles']
+        unknown = [title for title in titles if title not in positions]
+        if unknown:
+            raise CatalogError(f"Unknown models: {', '.join(sorted(unknown))}")
+        return [entries['models'][position] for position in sorted({positions[title] for title in titles})]
+
+    def models_for_app(self, generation_app: str) -> List[dict]:
+        return self._snapshot()['models_by_app'].get(generation_app, [])
+
+    @property
+    def styles(self) -> List[dict]:
+        return self._snapshot()['styles']
+
+    def style(self, name: str) -> Optional[dict]:
+        entries = self._snapshot()
+        position = entries['style_names'].get(name)
+        return None if position is None else entries['styles'][position]
+
+    @property
+    def examples(self) -> List[dict]:
+        return self._snapshot()['examples']
+
+    def example(self, title: str) -> Optional[dict]:
+        entries = self._snapshot()
+        position = entries['example_titles'].get(title)
+        return None if position is None else entries['examples'][position]
+
+    def text(self, name: str) -> str:
+        """A text file's contents: 'expander', 'header', 'css' or 'footer'."""
+        return self._snapshot()[name]
+
+    @property
+    def title(self) -> str:
+        return self._snapshot()['title']
+
+    @property
+    def image_path(self) -> Optional[str]:
+        return self._snapshot()['image_path']
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog() -> Catalog:
+    """Returns the process-wide catalog."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = Catalog()
+        return _catalog
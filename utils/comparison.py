@@ -0,0 +1,246 @@
+import os
+import asyncio
+import logging
+import functools
+import time
+import threading
+from urllib.parse import urlparse
+
+from utils.config import load_config
+from utils.telegram_delivery import get_telegram_delivery
+from utils.generation_engine import get_generation_engine, get_provider, run_hedged, TIMED_OUT
+from utils.generator_registry import get_generator_registry
+from utils.result_cache import get_result_cache, make_cache_key
+from utils.upload_pipeline import get_upload_pipeline
+from utils.translation_cache import get_translation_cache
+from utils.model_health import get_model_health
+from utils.metrics import get_metrics
+
+# Load environment variables from .env file
+load_config()
+
+# The comparison pipeline: translation, generation, storage, the HTML page and the
+# Telegram copy. Kept apart from the Streamlit page so scripts and benchmarks can run it.
+
+logger = logging.getLogger(__name__)
+
+COMPARISON_TEMPLATE = "template.html"
+
+def make_template_environment():
+    """
+    Templates are compiled once and kept by the environment, which recompiles a template
+    when its file changes. TEMPLATE_BYTECODE_CACHE keeps the compiled code on disk across
+    restarts (empty to disable).
+    """
+    from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+    bytecode_cache_dir = os.getenv("TEMPLATE_BYTECODE_CACHE", os.path.join("cache", "jinja"))
+    bytecode_cache = None
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+    return Environment(loader=FileSystemLoader("."), bytecode_cache=bytecode_cache, auto_reload=True)
+
+_template_environment = None
+_template_environment_lock = threading.Lock()
+
+def get_template_environment():
+    """Returns the process-wide template environment, created on the first render."""
+    global _template_environment
+    with _template_environment_lock:
+        if _template_environment is None:
+            _template_environment = make_template_environment()
+        return _template_environment
+
+def get_file_type_from_url(url):
+    if url is None:
+        return 'error'
+    parsed_url = urlparse(url)
+    path = parsed_url.path
+    if path.endswith('.mp4'):
+        return 'video'
+    else:
+        return 'image'
+    # elif path.endswith(('.jpg', '.jpeg', '.png', '.gif')):
+    #     return 'image'
+    # else:
+    #     return 'unknown'
+
+async def translate_to_english(text):
+    try:
+        with get_metrics().span("translation"):
+            return await get_translation_cache().atranslate(text)
+    except Exception as e:
+        # Only shows on the page when called from a Streamlit session
+        import streamlit as st
+        st.error(f"שגיאה בתרגום: {str(e)}")
+        return text
+                
+def is_supported(model) -> bool:
+    """Dedicated providers, and Hugging Face models, which are named "<owner>/<model>"."""
+    return get_provider(model) != 'huggingface' or '/' in model['generation_app']
+
+def call_generator(generator, prompt, model):
+    """Returns the generation coroutine for a model, with the arguments its generator expects."""
+    if model['generation_app'] == 'pollinations':
+        return generator.generate(prompt, model['name'], seed=model.get('seed', generator.DEFAULT_SEED),
+                                  enhance=model.get('enhance', False))
+    elif model['generation_app'] in ('hand_drawn_cartoon_style', 'animatediff_lightning', 'unsplash'):
+        return generator.generate(prompt)
+    # elif model['generation_app'] == 'sdxl_lightning':
+    #     sdxl_lightning_generator = SDXLLightningGenerator()
+    #     return sdxl_lightning_generator.generate_image(prompt)
+    else:
+        return generator.generate(prompt, model['generation_app'])
+        # image_url = generate_image(prompt, model['generation_app'])
+        # return image_url
+
+async def generate_media(prompt, model, style="", use_cache=None):
+    """
+    First pipeline stage: returns the cached media URL, or the generator's GeneratedMedia
+    for store_media() to upload.
+    """
+    # Deterministic models are served from the result cache when possible
+    result_cache = get_result_cache()
+    cacheable = result_cache.is_cacheable(model, use_cache)
+    if cacheable:
+        cached_url = result_cache.get(prompt, model, style)
+        if cached_url:
+            print(f"Cache hit for {model['title']}: {cached_url}")
+            return cached_url
+
+    if not is_supported(model):
+        logger.warning("Image generation for %s is not implemented", model['generation_app'])
+        return None
+
+    # Models that keep failing are skipped until their circuit lets a probe through
+    health = get_model_health()
+    if not health.allow(model):
+        print(f"Skipping {model['title']}: temporarily unavailable")
+        return None
+
+    engine = get_generation_engine()
+    started_at = time.monotonic()
+    try:
+        # Generators are created once per process and shared across reruns and sessions
+        generator = await get_generator_registry().aget(model)
+        call = functools.partial(call_generator, generator, prompt, model)
+        if model.get('hedge'):
+            # Tail-latency-prone providers get a second request once the first runs long
+            generation = run_hedged(call, engine.hedge_delay_for(model))
+        else:
+            generation = call()
+        with get_metrics().span("provider_request", model['generation_app'], model.get('name')) as request_span:
+            image_url = await asyncio.wait_for(generation, engine.timeout_for(model))
+            if image_url is None:
+                request_span.fail()
+    except asyncio.TimeoutError:
+        print(f"Timed out generating media for {model['title']} after {engine.timeout_for(model):.0f}s")
+        health.record_failure(model)
+        raise
+    except asyncio.CancelledError:
+        health.release(model)
+        raise
+    except Exception as e:
+        print(f"Error generating media for {model['title']}: {str(e)}")
+        health.record_failure(model)
+        return None
+
+    if image_url is None:
+        health.record_failure(model)
+    else:
+        health.record_success(model, time.monotonic() - started_at)
+    
+    # Remove 'https://' from the media_url if it exists
+    # if 'https://' in image_url:
+    #     image_url = image_url.replace('https://', '')
+    
+    return image_url
+
+async def store_media(prompt, model, media, style="", use_cache=None):
+    """Second pipeline stage: stores generated media through the upload queue and caches its URL."""
+    if media is None or isinstance(media, str):
+        # Failed, or already a URL from the result cache
+        return media
+    try:
+        with get_metrics().span("upload", model['generation_app'], model.get('name')):
+            media_url = await get_upload_pipeline().submit(media)
+    except Exception as e:
+        print(f"Error storing media for {model['title']}: {str(e)}")
+        return None
+
+    result_cache = get_result_cache()
+    if result_cache.is_cacheable(model, use_cache):
+        result_cache.set(prompt, model, media_url, style)
+    return media_url
+
+def record_result(model, media_url):
+    """Fills a model dict in with its outcome: media_url, media_type, timed_out and unavailable."""
+    model['timed_out'] = media_url is TIMED_OUT
+    if model['timed_out']:
+        media_url = None
+    model['media_url'] = media_url
+    model['media_type'] = get_file_type_from_url(model['media_url'])
+    model['unavailable'] = media_url is None and not get_model_health().is_available(model)
+
+def stream_comparison(orginal_prompt, models):
+    """Yields the comparison page (template.html) as UTF-8 chunks, as the template renders them."""
+    template = get_template_environment().get_template(COMPARISON_TEMPLATE)
+    for chunk in template.generate(prompt=orginal_prompt, models=models):
+        yield chunk.encode("utf-8")
+
+def render_comparison(orginal_prompt, models) -> bytes:
+    """
+    Renders the comparison page for models filled in by record_result(), as UTF-8 bytes.
+    The download, the in-app view and the Telegram copy all use this one buffer.
+    """
+    with get_metrics().span("render"):
+        return b"".join(stream_comparison(orginal_prompt, models))
+
+async def generate_html(orginal_prompt,full_prompt, selected_models, progress_bar, status_text, style_prefix="", on_model_done=None):
+    # Translate while the generators for the selected models are being prepared
+    english_prompt, _ = await asyncio.gather(
+        translate_to_english(full_prompt),
+        get_generator_registry().prepare(selected_models)
+    )
+
+    print(f"Original Prompt: {orginal_prompt}")
+
+    total_models = len(selected_models)
+    status_text.text(f"מייצר תמונות ב-{total_models} מודלים במקביל...")
+
+    # All models are dispatched at once, results arrive in completion order
+    engine = get_generation_engine()
+    completed = 0
+    generate = functools.partial(generate_media, style=style_prefix)
+    store = functools.partial(store_media, style=style_prefix)
+    # Keyed like the result cache: identical concurrent requests share one generation
+    key = functools.partial(make_cache_key, style=style_prefix)
+    async for model, media_url in engine.run(english_prompt, selected_models, generate, store, key=key):
+        completed += 1
+        record_result(model, media_url)
+        if model['media_url']:
+            print(f"Generated media URL for {model['title']}: {model['media_url']}")
+        else:
+            print(f"Failed to generate media for {model['title']}")
+        if on_model_done:
+            on_model_done(model)
+        status_text.text(f"הסתיים מודל: {model['title']} ({completed}/{total_models})")
+        progress_bar.progress(completed / total_models)
+
+    return render_comparison(orginal_prompt, selected_models)
+
+def send_telegram_message_and_file(message, file_content: bytes):
+    """Queues the page for the Telegram worker. Returns at once: delivery and its retries run in the background."""
+    get_telegram_delivery().send_document(file_content, caption=message)
+
+async def run_comparison_job(payload, reporter):
+    """
+    Runs a comparison submitted to the job queue: generates the page, reporting progress
+    and each finished model to the job, and queues a copy for Telegram.
+    """
+    html_content = await generate_html(
+        payload['prompt'], payload['full_prompt'], payload['models'], reporter, reporter,
+        payload['style_prefix'], reporter.model_done
+    )
+    send_telegram_message_and_file(payload['full_prompt'], html_content)
+    return html_content
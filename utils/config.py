@@ -0,0 +1,19 @@
+import threading
+from dotenv import load_dotenv
+
+_loaded = False
+_lock = threading.Lock()
+
+def load_config():
+    """
+    Loads the .env file at the project root into os.environ, once per process. Every
+    module calls this at import; only the first call reads the file. Variables already
+    set in the environment win over the file, as with load_dotenv().
+    """
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            load_dotenv()
+            _loaded = True
@@ -1,9 +1,10 @@
 import os
 import streamlit as st
-from dotenv import load_dotenv
+
+from utils.config import load_config
 
 # Load environment variables from .env file
-load_dotenv()
+load_config()
 
 # Retrieve the COUNTER value from the .env file
 def get_user_count(formatted=False):
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import threading
+from typing import Optional
+from PIL import Image
+
+from utils.config import load_config
+from utils.thumbnails import get_thumbnail_cache, file_hash
+
+# Load environment variables from .env file
+load_config()
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+DESCRIPTION_FILE = "prompt_description.md"
+# Indexes persisted by other versions (which stored thumbnail URLs) are rebuilt
+INDEX_VERSION = 2
+
+class GalleryIndex:
+    """
+    The example folders under uploads/: each folder's description and, per image, its
+    dimensions, format and content hash. Thumbnails are not part of the index; they are
+    looked up in the ThumbnailCache, whose manifest tracks the files they live in.
+
+    The index is kept in memory and persisted to a JSON file, so a restart doesn't read
+    every image again. At most every refresh_interval seconds, the root folder and the
+    example folders are stat'ed; only a folder whose mtime changed (an image added,
+    removed or renamed) is scanned again with os.scandir, and only its new or changed
+    files are opened. Between checks, rendering the gallery touches no files at all.
+    Rendering doesn't wait for a scan either: while one runs (the warm-up's, at startup),
+    the page gets the index as it was last persisted. Only without any persisted index
+    does it wait for the first scan, which reads image headers but builds no thumbnails.
+
+    An image or description edited in place doesn't change its folder's mtime; call
+    refresh(force=True) to pick such edits up.
+    """
+    def __init__(self, root: str = None, path: str = None, refresh_interval: float = None):
+        self.root = root or os.getenv("GALLERY_ROOT", "uploads")
+        self.path = path or os.getenv("GALLERY_INDEX_PATH", os.path.join("cache", "gallery_index.json"))
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(os.getenv("GALLERY_REFRESH_INTERVAL", 10))
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._index = self._load()
+        # Whether there is an index to show, persisted or scanned
+        self._scanned = self._index['root_mtime'] is not None
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+            if index.get('root') == self.root and index.get('version') == INDEX_VERSION:
+                return index
+        except (OSError, json.JSONDecodeError):
+            pass
+        return {'version': INDEX_VERSION, 'root': self.root, 'root_mtime': None, 'folders': {}}
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self._index, file, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def folders(self) -> dict:
+        """Folder name -> {'description': ..., 'models': [image entries]}, in name order."""
+        self.refresh(wait=not self._scanned)
+        return self._index['folders']
+
+    def get(self, folder: str) -> Optional[dict]:
+        self.refresh(wait=not self._scanned)
+        return self._index['folders'].get(folder)
+
+    def refresh(self, force: bool = False, wait: bool = True):
+        """
+        Rescans the folders that changed since the last scan. Cheap when nothing did.
+
+        :param wait: If False, returns at once when another thread is scanning.
+        """
+        if not force and time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        if not self._lock.acquire(blocking=wait):
+            return
+        try:
+            if not force and time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            if self._update(force):
+                self._save()
+            self._checked_at = time.monotonic()
+            self._scanned = True
+        finally:
+            self._lock.release()
+
+    def _update(self, force) -> bool:
+        try:
+            root_mtime = os.stat(self.root).st_mtime
+        except OSError:
+            changed = bool(self._index['folders'])
+            self._index['folders'] = {}
+            return changed
+        changed = False
+        old_folders = self._index['folders']
+        if force or root_mtime != self._index['root_mtime']:
+            # Folders were added or removed
+            with os.scandir(self.root) as entries:
+                names = sorted(entry.name for entry in entries if entry.is_dir())
+            self._index['root_mtime'] = root_mtime
+            changed = names != list(old_folders)
+        else:
+            names = list(old_folders)
+
+        folders = {}
+        for name in names:
+            folder_path = os.path.join(self.root, name)
+            folder = old_folders.get(name)
+            try:
+                mtime = os.stat(folder_path).st_mtime
+            except OSError:
+                changed = True
+                continue
+            if force or folder is None or folder['mtime'] != mtime:
+                folder = self._scan_folder(folder_path, mtime, folder, force)
+                changed = True
+            folders[name] = folder
+        self._index['folders'] = folders
+        return changed
+
+    def _scan_folder(self, folder_path, mtime, old_folder, force) -> dict:
+        old_models = {model['file_name']: model for model in (old_folder or {}).get('models', [])}
+        description = ""
+        models = []
+        with os.scandir(folder_path) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+        for entry in entries:
+            if entry.name == DESCRIPTION_FILE:
+                with open(entry.path, "r", encoding="utf-8") as file:
+                    description = file.read().strip()
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                stat = entry.stat()
+                model = old_models.get(entry.name)
+                if force or model is None or model['mtime'] != stat.st_mtime or model['size'] != stat.st_size:
+                    model = self._index_image(entry.path, entry.name, stat)
+                if model:
+                    models.append(model)
+        return {'mtime': mtime, 'description': description, 'models': models}
+
+    @staticmethod
+    def _index_image(image_path, file_name, stat) -> Optional[dict]:
+        try:
+            # Only the header is read
+            with Image.open(image_path) as image:
+                width, height = image.size
+                image_format = image.format
+        except Exception as e:
+            print(f"Error loading image: {image_path}. Error: {str(e)}")
+            return None
+        return {
+            'name': os.path.splitext(file_name)[0],
+            'file_name': file_name,
+            'image_path': image_path,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'width': width,
+            'height': height,
+            'format': image_format,
+            'hash': file_hash(image_path),
+        }
+
+_gallery_index = None
+_gallery_index_lock = threading.Lock()
+_warm_up_started = False
+
+def get_gallery_index() -> GalleryIndex:
+    """Returns the process-wide gallery index."""
+    global _gallery_index
+    with _gallery_index_lock:
+        if _gallery_index is None:
+            _gallery_index = GalleryIndex()
+        return _gallery_index
+
+def _warm_up():
+    try:
+        index = get_gallery_index()
+        index.refresh()
+        image_paths = [model['image_path'] for folder in index.folders().values() for model in folder['models']]
+        print(f"Gallery index ready with {len(image_paths)} example images")
+        # Built by the thumbnail cache's own thread, outside the index's lock
+        get_thumbnail_cache().build_in_background(image_paths)
+    except Exception as e:
+        print(f"Gallery index warm-up failed: {str(e)}")
+
+def start_warm_up():
+    """Builds (or updates) the gallery index and its thumbnails once per process, in the background."""
+    global _warm_up_started
+    with _gallery_index_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=_warm_up, name="gallery-index-warm-up", daemon=True).start()
@@ -0,0 +1,172 @@
+import os
+import asyncio
+import functools
+import threading
+
+from utils.config import load_config
+from utils.http_client import get_http_client
+from utils.model_health import get_model_health
+from utils.single_flight import SingleFlight
+
+# Load environment variables from .env file
+load_config()
+
+# generation_app values that talk to their own backend. Every other generation_app
+# is a Hugging Face model id served by the shared inference API.
+DEDICATED_PROVIDERS = {'pollinations', 'hand_drawn_cartoon_style', 'animatediff_lightning', 'unsplash'}
+
+def get_provider(model):
+    """Returns the backend that serves a model, used to group models for concurrency limits."""
+    generation_app = model['generation_app']
+    if generation_app in DEDICATED_PROVIDERS:
+        return generation_app
+    return 'huggingface'
+
+# Yielded by GenerationEngine.run() in place of a result for models that ran out of time
+TIMED_OUT = object()
+
+async def run_hedged(call, hedge_delay):
+    """
+    Awaits call(), and if it hasn't finished after hedge_delay seconds, races a second
+    call() against it. Returns the first non-None result; the other request is cancelled.
+    A first request that fails before the hedge delay is not retried.
+    """
+    tasks = {asyncio.ensure_future(call())}
+    hedge_sent = False
+    error = None
+    try:
+        while tasks:
+            done, tasks = await asyncio.wait(
+                tasks, timeout=None if hedge_sent else hedge_delay, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                print(f"No response after {hedge_delay:.1f}s, sending a hedged request")
+                hedge_sent = True
+                tasks.add(asyncio.ensure_future(call()))
+                continue
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                elif task.result() is not None:
+                    return task.result()
+        if error is not None:
+            raise error
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+class GenerationEngine:
+    """
+    Runs the generation of all selected models at once instead of one after another.
+
+    Concurrency is bounded by a global limit and a per-provider limit. Generations run on
+    the shared http client loop, so both limits are process-wide and concurrent Streamlit
+    sessions share the same slots.
+
+    Each generation gets a time budget: the model's "timeout" in data/models.json, or
+    model_timeout. A whole comparison gets deadline seconds, after which the models still
+    running are reported as TIMED_OUT.
+    """
+    def __init__(self, max_concurrency: int = None, max_per_provider: int = None, http_client=None,
+                 model_timeout: float = None, deadline: float = None, hedge_percentile: float = None,
+                 hedge_delay: float = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("MAX_CONCURRENT_GENERATIONS", 8))
+        self.max_per_provider = max_per_provider or int(os.getenv("MAX_CONCURRENT_PER_PROVIDER", 4))
+        self.model_timeout = model_timeout or float(os.getenv("MODEL_TIMEOUT", 60))
+        self.deadline = deadline or float(os.getenv("COMPARISON_DEADLINE", 180))
+        self.hedge_percentile = hedge_percentile or float(os.getenv("HEDGE_PERCENTILE", 95))
+        self.hedge_delay = hedge_delay or float(os.getenv("HEDGE_DELAY", 10))
+        self.http = http_client or get_http_client()
+        self._global_slots = asyncio.Semaphore(self.max_concurrency)
+        self._provider_slots = {}
+        self.single_flight = SingleFlight()
+
+    def _get_provider_slots(self, provider):
+        # Only called from the shared loop thread, so no locking is needed
+        if provider not in self._provider_slots:
+            self._provider_slots[provider] = asyncio.Semaphore(self.max_per_provider)
+        return self._provider_slots[provider]
+
+    def timeout_for(self, model) -> float:
+        """Seconds a single generation of this model may take."""
+        return float(model.get('timeout', self.model_timeout))
+
+    def hedge_delay_for(self, model) -> float:
+        """
+        How long to wait before hedging a request to this model: its recent latency at
+        hedge_percentile, or hedge_delay until there is enough history.
+        """
+        latency = get_model_health().breaker(model).percentile(self.hedge_percentile)
+        return latency if latency is not None else self.hedge_delay
+
+    async def _generate_bounded(self, generate, store, prompt, model):
+        # Always take the provider slot before the global one so a crowded provider
+        # never holds global slots while it waits
+        try:
+            async with self._get_provider_slots(get_provider(model)):
+                async with self._global_slots:
+                    result = await generate(prompt, model)
+        except asyncio.TimeoutError:
+            return TIMED_OUT
+        # Storing is a separate stage with its own queue, so it doesn't hold generation slots
+        if store is not None:
+            result = await store(prompt, model, result)
+        return result
+
+    async def _dispatch(self, generate, store, prompt, model, key):
+        call = functools.partial(self._generate_bounded, generate, store, prompt, model)
+        if key is None:
+            return model, await call()
+        # An identical generation already in flight (another session, same prompt and
+        # model) is joined rather than sent to the provider and uploaded again
+        return model, await self.single_flight.do(key(prompt, model), call)
+
+    async def run(self, prompt, models, generate, store=None, deadline: float = None, key=None):
+        """
+        Dispatches every model at once and yields (model, result) pairs in completion order.
+        Models still running at the deadline are yielded last with TIMED_OUT as their result.
+
+        :param prompt: The (English) prompt passed to every model.
+        :param models: The model dicts to generate with.
+        :param generate: A coroutine function taking (prompt, model), run within the concurrency limits.
+            It may raise asyncio.TimeoutError, which is reported as TIMED_OUT.
+        :param store: An optional coroutine function taking (prompt, model, generated result) and
+            returning the final result, run outside the concurrency limits.
+        :param deadline: Seconds the whole comparison may take. Defaults to the engine's deadline.
+        :param key: An optional function taking (prompt, model) and returning a key that identifies
+            the generation. Concurrent generations with equal keys are run once and share the result.
+        """
+        loop = asyncio.get_running_loop()
+        ends_at = loop.time() + (deadline or self.deadline)
+        pending = {
+            asyncio.ensure_future(self.http.run(self._dispatch(generate, store, prompt, model, key))): model
+            for model in models
+        }
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=max(0, ends_at - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    del pending[task]
+                    yield task.result()
+            for model in pending.values():
+                print(f"Deadline passed before {model['title']} finished")
+                yield model, TIMED_OUT
+        finally:
+            for task in pending:
+                task.cancel()
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_generation_engine():
+    """Returns the process-wide generation engine."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = GenerationEngine()
+        return _engine
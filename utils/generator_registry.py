@@ -0,0 +1,106 @@
+import os
+import time
+import asyncio
+import importlib
+import threading
+
+from utils.config import load_config
+from utils.generation_engine import get_provider
+from utils.text_to_image.base_generator import BaseGenerator
+
+# Load environment variables from .env file
+load_config()
+
+# Keyed by provider: every Hugging Face model id shares a single HugginsGenerator,
+# since the model name is passed on each call. Modules are imported on the first use of
+# their provider, so gradio_client (cartoon, AnimateDiff) isn't loaded at startup
+GENERATOR_CLASSES = {
+    'pollinations': "utils.text_to_image.pollinations_generator:PollinationsGenerator",
+    'hand_drawn_cartoon_style': "utils.text_to_image.hand_drawn_cartoon_generator:HandDrawnCartoonGenerator",
+    'animatediff_lightning': "utils.text_to_video.animatediff_lightning_generator:AnimateDiffLightningGenerator",
+    'unsplash': "utils.text_to_image.unsplash_generator:UnsplashGenerator",
+    'huggingface': "utils.text_to_image.huggins_generator:HugginsGenerator",
+}
+
+def load_generator_class(provider: str) -> type:
+    """Imports a provider's generator module and returns its class."""
+    module_name, class_name = GENERATOR_CLASSES[provider].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+class GeneratorRegistry:
+    """
+    Lazily creates each generator once and reuses it across reruns and sessions.
+
+    Building a gradio-backed generator fetches the Space config over the network, so the
+    instances are cached per provider. An instance is rebuilt when it marked itself stale
+    or when it is older than max_age seconds.
+
+    factories overrides how a provider's generator is built (by default its class in
+    GENERATOR_CLASSES, called without arguments), e.g. to point it at a stand-in backend.
+    """
+    def __init__(self, max_age: float = None, factories: dict = None):
+        self.max_age = max_age or float(os.getenv("GENERATOR_MAX_AGE", 3600))
+        self.factories = dict(factories or {})
+        self._entries = {}  # provider -> (generator, created_at)
+        self._lock = threading.Lock()
+        self._provider_locks = {}
+
+    def _is_usable(self, entry):
+        if entry is None:
+            return False
+        generator, created_at = entry
+        return not generator.stale and time.monotonic() - created_at < self.max_age
+
+    def _get_provider_lock(self, provider):
+        with self._lock:
+            return self._provider_locks.setdefault(provider, threading.Lock())
+
+    def get(self, model) -> BaseGenerator:
+        """Returns the shared generator for a model, creating it on first use. May block."""
+        provider = get_provider(model)
+        entry = self._entries.get(provider)
+        if self._is_usable(entry):
+            return entry[0]
+
+        # One lock per provider, so a slow gradio Space doesn't hold up the others
+        with self._get_provider_lock(provider):
+            entry = self._entries.get(provider)
+            if self._is_usable(entry):
+                return entry[0]
+            if entry is not None:
+                print(f"Rebuilding stale generator for {provider}")
+            factory = self.factories.get(provider) or load_generator_class(provider)
+            generator = factory()
+            self._entries[provider] = (generator, time.monotonic())
+            return generator
+
+    async def aget(self, model) -> BaseGenerator:
+        """Like get(), but builds missing generators in a worker thread."""
+        entry = self._entries.get(get_provider(model))
+        if self._is_usable(entry):
+            return entry[0]
+        return await asyncio.to_thread(self.get, model)
+
+    async def prepare(self, models):
+        """Builds the generators for the given models ahead of dispatch. Failures are left for dispatch to report."""
+        unique_models = {get_provider(model): model for model in models}.values()
+        await asyncio.gather(*(self.aget(model) for model in unique_models), return_exceptions=True)
+
+    def reset(self, model=None):
+        """Drops one provider's generator, or all of them."""
+        with self._lock:
+            if model is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(get_provider(model), None)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_generator_registry() -> GeneratorRegistry:
+    """Returns the process-wide generator registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = GeneratorRegistry()
+        return _registry
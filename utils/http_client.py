@@ -0,0 +1,81 @@
+import os
+import asyncio
+import threading
+import concurrent.futures
+import aiohttp
+
+from utils.config import load_config
+
+# Load environment variables from .env file
+load_config()
+
+class HttpClient:
+    """
+    A single long-lived aiohttp session shared by every generator in the process.
+
+    Streamlit runs every rerun inside a fresh asyncio.run() loop, which would throw the
+    connection pool away each time. The session therefore lives on its own event loop
+    thread, and coroutines started from any other loop are handed over with run().
+    """
+    def __init__(self, connect_timeout: float = None, read_timeout: float = None,
+                 limit_per_host: int = None, keepalive_timeout: float = None):
+        self.timeout = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=connect_timeout or float(os.getenv("HTTP_CONNECT_TIMEOUT", 10)),
+            sock_read=read_timeout or float(os.getenv("HTTP_READ_TIMEOUT", 120))
+        )
+        self.limit_per_host = limit_per_host or int(os.getenv("HTTP_LIMIT_PER_HOST", 10))
+        self.keepalive_timeout = keepalive_timeout or float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 60))
+        self._session = None
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="http-client-loop", daemon=True)
+        self._thread.start()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session. Only use it from coroutines running on self.loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedules a coroutine on the shared loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def run(self, coro):
+        """Awaits a coroutine on the shared loop, whichever loop the caller runs on."""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self.loop:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def run_sync(self, coro):
+        """Blocks the calling thread until the coroutine finishes on the shared loop."""
+        return self.submit(coro).result()
+
+    async def _close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    def close(self):
+        self.run_sync(self._close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_http_client() -> HttpClient:
+    """Returns the process-wide http client."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient()
+        return _http_client
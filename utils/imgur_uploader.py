@@ -1,15 +1,29 @@
 import os
+import time
 import base64
+import random
+import asyncio
+import threading
+import aiohttp
 import requests
+from collections.abc import AsyncIterable
 from concurrent.futures import ThreadPoolExecutor
-from typing import Union, Literal, List, Tuple
-from dotenv import load_dotenv
+from typing import Union, Literal, List, Tuple, BinaryIO
+
+from utils.config import load_config
+from utils.rate_limiter import get_rate_limiter
 
 # Load environment variables from .env file
-load_dotenv()
+load_config()
+
+# Returned instead of a media link when the upload fails
+NO_IMAGE_URL = "https://i.ibb.co/wWFYPtQ/no-image.png"
+
+UPLOAD_URL = os.getenv("IMGUR_UPLOAD_URL", "https://api.imgur.com/3/upload")
 
 class ImgurUploader:
-    def __init__(self, client_id: str = None, max_retries: int = 3, timeout: int = 10, max_workers: int = 5):
+    def __init__(self, client_id: str = None, max_retries: int = 3, timeout: int = 10, max_workers: int = 5,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0):
         self.imgur_client_id = client_id or os.getenv("IMGUR_CLIENT_ID")
         if not self.imgur_client_id:
             raise ValueError("Imgur Client-ID not found. Please provide it or set it in the environment variables.")
@@ -18,6 +32,8 @@ class ImgurUploader:
         self.session.headers.update({'Authorization': f'Client-ID {self.imgur_client_id}'})
         self.max_retries = max_retries
         self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
 
     def upload_media_to_imgur(
@@ -43,30 +59,115 @@ class ImgurUploader:
             'video': media_base64 if media_type == "video" else None
         }
 
-        return self._execute_with_retry("https://api.imgur.com/3/upload", payload)
+        return self._execute_with_retry(UPLOAD_URL, payload)
+
+    def upload_media_bytes(
+        self, media: Union[bytes, BinaryIO], media_type: Literal["image", "video"],
+        title: str = "AI Generated Media",
+        description: str = "This media was generated by an AI model",
+        filename: str = None, content_type: str = None
+    ) -> str:
+        """
+        Uploads raw media as multipart/form-data, without a base64 copy of the payload.
+
+        :param media: The media bytes, or a binary file object opened for reading.
+        :param media_type: Type of media, either "image" or "video".
+        :param title: Title for the media.
+        :param description: Description for the media.
+        :param filename: Optional file name sent with the upload.
+        :param content_type: Optional MIME type of the media.
+        :return: URL of the uploaded media, or a placeholder if upload fails.
+        """
+        payload = {'type': 'file', 'title': title, 'description': description}
+        files = {media_type: (filename or media_type, media, content_type)}
+        return self._execute_with_retry(UPLOAD_URL, payload, files)
+
+    async def upload_media_stream(
+        self, session: aiohttp.ClientSession,
+        media: Union[bytes, BinaryIO, AsyncIterable], media_type: Literal["image", "video"],
+        title: str = "AI Generated Media",
+        description: str = "This media was generated by an AI model",
+        filename: str = None, content_type: str = None
+    ) -> str:
+        """
+        Uploads media as multipart/form-data from a coroutine.
+
+        An async byte stream (e.g. a provider response's content.iter_chunked()) is piped
+        straight into the upload without being buffered, so it can only be tried once.
+        Bytes and file objects are retried like the other upload methods.
+
+        :param session: The aiohttp session to upload with.
+        :param media: The media bytes, a binary file object or an async iterable of byte chunks.
+        :return: URL of the uploaded media, or a placeholder if upload fails.
+        """
+        attempts = 1 if isinstance(media, AsyncIterable) else self.max_retries
+        headers = {'Authorization': f'Client-ID {self.imgur_client_id}'}
+        rate_limiter = get_rate_limiter()
+        for attempt in range(attempts):
+            if hasattr(media, 'seek'):
+                media.seek(0)
+            form = aiohttp.FormData()
+            form.add_field('type', 'file')
+            form.add_field('title', title)
+            form.add_field('description', description)
+            form.add_field(media_type, media, filename=filename or media_type, content_type=content_type)
+            rate_limited = False
+            try:
+                await rate_limiter.acquire('imgur', self.imgur_client_id)
+                async with session.post(UPLOAD_URL, data=form, headers=headers) as response:
+                    rate_limited = bool(rate_limiter.observe('imgur', self.imgur_client_id, response.status, response.headers))
+                    response.raise_for_status()
+                    data = await response.json()
+                    return data.get('data', {}).get('link', NO_IMAGE_URL)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == attempts - 1:
+                    print(f"Upload failed after {attempts} attempts: {e}")
+                    return NO_IMAGE_URL
+                print(f"Attempt {attempt + 1} failed. Retrying...")
+                # When Imgur asked us to back off, the rate limiter already holds the retry back
+                if not rate_limited:
+                    await asyncio.sleep(self._backoff_delay(attempt))
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, so parallel uploads don't retry in lockstep."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
 
-    def _execute_with_retry(self, url: str, payload: dict) -> str:
+    def _execute_with_retry(self, url: str, payload: dict, files: dict = None) -> str:
         # print(payload)
+        rate_limiter = get_rate_limiter()
         for attempt in range(self.max_retries):
+            rate_limited = False
             try:
-                response = self.session.post(url, data=payload, timeout=self.timeout)
+                # File objects have to be rewound before every attempt
+                for _, media, _ in (files or {}).values():
+                    if hasattr(media, 'seek'):
+                        media.seek(0)
+                rate_limiter.acquire_blocking('imgur', self.imgur_client_id)
+                response = self.session.post(url, data=payload, files=files, timeout=self.timeout)
+                rate_limited = bool(rate_limiter.observe('imgur', self.imgur_client_id, response.status_code, response.headers))
                 response.raise_for_status()
-                return response.json().get('data', {}).get('link', "https://i.ibb.co/wWFYPtQ/no-image.png")
+                return response.json().get('data', {}).get('link', NO_IMAGE_URL)
             except requests.exceptions.RequestException as e:
                 if attempt == self.max_retries - 1:
                     print(f"Upload failed after {self.max_retries} attempts.")
-                    return "https://i.ibb.co/wWFYPtQ/no-image.png"
+                    return NO_IMAGE_URL
                 print(f"Attempt {attempt + 1} failed. Retrying...")
+                if not rate_limited:
+                    time.sleep(self._backoff_delay(attempt))
 
-    def upload_multiple(self, media_list: List[Tuple[str, Literal["image", "video"], str, str]]) -> List[str]:
+    def upload_multiple(self, media_list: List[Tuple[Union[str, bytes, BinaryIO], Literal["image", "video"], str, str]]) -> List[str]:
         """
         Uploads multiple media items to Imgur concurrently.
 
-        :param media_list: List of tuples (media_base64, media_type, title, description)
+        :param media_list: List of tuples (media, media_type, title, description). The media
+            is either a base64-encoded string, raw bytes or a binary file object.
         :return: List of URLs of the uploaded media
         """
         futures = [
-            self.executor.submit(self.upload_media_to_imgur, media, media_type, title, description)
+            self.executor.submit(
+                self.upload_media_to_imgur if isinstance(media, str) else self.upload_media_bytes,
+                media, media_type, title, description
+            )
             for media, media_type, title, description in media_list
         ]
         return [future.result() for future in futures]
@@ -75,6 +176,17 @@ class ImgurUploader:
         self.session.close()
         self.executor.shutdown(wait=False)
 
+_uploader = None
+_uploader_lock = threading.Lock()
+
+def get_imgur_uploader() -> ImgurUploader:
+    """Returns the process-wide uploader, so every generator shares one session and executor."""
+    global _uploader
+    with _uploader_lock:
+        if _uploader is None:
+            _uploader = ImgurUploader()
+        return _uploader
+
 # Example usage
 if __name__ == "__main__":
     uploader = ImgurUploader()
@@ -1,37 +1,23 @@
 import streamlit as st
-import os
+
+from utils.catalog import get_catalog
 
 def initialize():    
-    # Load header content
-    header_file_path = os.path.join('utils', 'header.md')
-    try:
-        with open(header_file_path, 'r', encoding='utf-8') as header_file:
-            header_content = header_file.read()
-    except FileNotFoundError:
+    # The header, CSS and footer are read once by the catalog, and again only when edited
+    catalog = get_catalog()
+    if 'header' in catalog.missing:
         st.error("header.md file not found in utils folder.")
-        header_content = ""  # Provide a default empty header
 
     # Extract title and image path from header content
-    header_lines = header_content.split('\n')
-    title = header_lines[0].strip('# ')
-    image_path = None    
-    for line in header_lines:
-        if line.startswith('!['):
-            image_path = line.split('(')[1].split(')')[0]
-            break
+    title = catalog.title
+    image_path = catalog.image_path
 
     # Load external CSS
-    css_file_path = os.path.join('utils', 'styles.css')
-    with open(css_file_path, 'r') as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)    
+    st.markdown(f'<style>{catalog.text("css")}</style>', unsafe_allow_html=True)    
     
     # Load footer content
-    footer_file_path = os.path.join('utils', 'footer.md')
-    try:
-        with open(footer_file_path, 'r', encoding='utf-8') as footer_file:
-            footer_content = footer_file.read()
-    except FileNotFoundError:
+    if 'footer' in catalog.missing:
         st.error("footer.md file not found in utils folder.")
-        footer_content = ""  # Provide a default empty footer    
+    footer_content = catalog.text('footer')
 
-    return title, image_path, footer_content
\ No newline at end of file
+    return title, image_path, footer_content
@@ -0,0 +1,114 @@
+import os
+import json
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from utils.config import load_config
+from utils.http_client import HttpClient, get_http_client
+from utils.single_flight import SingleFlight
+from utils.job_queue import Job, get_job_queue
+from utils.offline_export import get_offline_exporter, INLINE, ZIP
+
+# Load environment variables from .env file
+load_config()
+
+# Download format -> (file name, MIME type)
+FORMATS = {
+    'html': ("comparison_results.html", "text/html"),
+    'offline': ("comparison_results_offline.html", "text/html"),
+    'zip': ("comparison_results.zip", "application/zip"),
+    'json': ("comparison_results.json", "application/json"),
+}
+
+class JobDownloads:
+    """
+    The files offered for a finished comparison job: the page itself (html), offline
+    copies with their media inlined into a single page (offline) or packaged next to it
+    (zip, see OfflineExporter), and a JSON manifest of the prompt and each model's
+    result (json).
+
+    Nothing is built until a download is clicked, so reruns of the page cost nothing.
+    A file is then built once per job and format, on the shared http client loop (two
+    clicks at once share one build), and kept in an in-memory LRU of at most max_bytes.
+    """
+    def __init__(self, http_client: HttpClient = None, max_bytes: int = None):
+        self.http = http_client or get_http_client()
+        self.max_bytes = max_bytes or int(float(os.getenv("DOWNLOAD_CACHE_MB", 64)) * 1024 * 1024)
+        self._memory = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._builds = SingleFlight()
+
+    def _remember(self, key, data):
+        with self._lock:
+            if key in self._memory:
+                self._size -= len(self._memory[key])
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get(self, job_id: str, file_format: str) -> bytes:
+        """Returns the file, building it on first use. Blocks the calling thread meanwhile."""
+        key = (job_id, file_format)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        data = self.http.run_sync(self._builds.do(key, lambda: self._build(job_id, file_format)))
+        self._remember(key, data)
+        return data
+
+    def loader(self, job_id: str, file_format: str) -> Callable[[], bytes]:
+        """A callable for st.download_button's data, which Streamlit only calls on click."""
+        return lambda: self.get(job_id, file_format)
+
+    async def _build(self, job_id, file_format) -> bytes:
+        job = get_job_queue().get(job_id)
+        if job is None or job.result is None:
+            raise ValueError(f"Job {job_id} has no result")
+        if file_format == 'html':
+            page = job.result
+            # Finished before pages were stored as bytes
+            return page.encode('utf-8') if isinstance(page, str) else page
+        if file_format in ('offline', 'zip'):
+            mode = INLINE if file_format == 'offline' else ZIP
+            export = await get_offline_exporter().export(job.payload['prompt'], job.models, mode=mode)
+            return export.data
+        if file_format == 'json':
+            return await asyncio.to_thread(self._manifest, job)
+        raise ValueError(f"Unknown download format: {file_format}")
+
+    @staticmethod
+    def _manifest(job: Job) -> bytes:
+        manifest = {
+            'job': job.id,
+            'prompt': job.payload['prompt'],
+            'full_prompt': job.payload['full_prompt'],
+            'style_prefix': job.payload['style_prefix'],
+            'created_at': job.created_at,
+            'results': [{
+                'model': model['title'],
+                'generation_app': model.get('generation_app'),
+                'media_type': model.get('media_type'),
+                'media_url': model.get('media_url'),
+                'timed_out': model.get('timed_out', False),
+                'unavailable': model.get('unavailable', False),
+            } for model in job.models],
+        }
+        return json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+
+_job_downloads = None
+_job_downloads_lock = threading.Lock()
+
+def get_job_downloads() -> JobDownloads:
+    """Returns the process-wide download cache."""
+    global _job_downloads
+    with _job_downloads_lock:
+        if _job_downloads is None:
+            _job_downloads = JobDownloads()
+        return _job_downloads
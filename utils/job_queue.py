@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Optional, Callable, Awaitable
+
+from utils.config import load_config
+from utils.comparison import run_comparison_job
+
+# Load environment variables from .env file
+load_config()
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+@dataclass
+class Job:
+    id: str
+    status: str
+    payload: dict
+    models: list
+    progress: float
+    status_text: str
+    result: Optional[bytes]
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+class JobReporter:
+    """
+    Handed to a running job. Has the progress() and text() methods of st.progress() and
+    st.empty(), so code written for the page can report into the job instead.
+    """
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+
+    def progress(self, value: float):
+        self.queue._update(self.job_id, progress=value)
+
+    def text(self, value: str):
+        self.queue._update(self.job_id, status_text=value)
+
+    def model_done(self, model: dict):
+        self.queue._update_model(self.job_id, model)
+
+class JobQueue:
+    """
+    A persistent queue of comparison jobs, run by a fixed pool of worker threads.
+
+    Jobs live in SQLite, so a job and its result outlive the Streamlit rerun (or page
+    load) that submitted it, and every session shares the same workers. Each worker runs
+    one job at a time in its own event loop, as a Streamlit session would.
+
+    Several processes can share the database. A running job is leased to the queue that
+    claimed it for lease seconds, and a heartbeat thread renews the leases of its jobs
+    while they run. A job whose lease has expired (its process died) is queued again by
+    whichever queue notices first; jobs of live processes are never taken over.
+
+    :param handler: A coroutine function taking (payload, reporter) and returning the job's
+        result as a string or bytes.
+    """
+    def __init__(self, handler: Callable[[dict, JobReporter], Awaitable[str]], path: str = None,
+                 workers: int = None, ttl: float = None, lease: float = None):
+        self.handler = handler
+        self.path = path or os.getenv("JOB_QUEUE_PATH", os.path.join("cache", "cache.db"))
+        self.workers = workers or int(os.getenv("JOB_WORKERS", 4))
+        self.ttl = ttl or float(os.getenv("JOB_TTL", 24 * 3600))
+        self.lease = lease or float(os.getenv("JOB_LEASE", 60))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._wake_up = threading.Condition()
+        self._threads = []
+        self._started = False
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT, payload TEXT, models TEXT, progress REAL, status_text TEXT, "
+            "result TEXT, error TEXT, created_at REAL, updated_at REAL, owner TEXT, lease_until REAL)"
+        )
+        # Databases created before leases
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (("owner", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                try:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+                except sqlite3.OperationalError as e:
+                    # Added by another process meanwhile
+                    if "duplicate column" not in str(e):
+                        raise
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created_at ON jobs (status, created_at)")
+        self._conn.commit()
+
+    def start(self):
+        """Starts the workers and the heartbeat. Jobs whose lease has expired are queued again."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._recover()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _recover(self) -> int:
+        """Queues the running jobs whose lease has expired again, and returns how many."""
+        with self._lock:
+            # Jobs claimed before leases existed have none; their last update stands in for it
+            recovered = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL "
+                "WHERE status = ? AND COALESCE(lease_until, updated_at + ?) < ?",
+                (QUEUED, RUNNING, self.lease, time.time())
+            ).rowcount
+            self._conn.commit()
+        if recovered:
+            print(f"Queued {recovered} job(s) again after their worker stopped")
+            with self._wake_up:
+                self._wake_up.notify_all()
+        return recovered
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.lease / 3)
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = ?",
+                        (time.time() + self.lease, self.owner, RUNNING)
+                    )
+                    self._conn.commit()
+                self._recover()
+            except sqlite3.Error as e:
+                print(f"Job heartbeat failed: {str(e)}")
+
+    def submit(self, payload: dict, models: list = None) -> str:
+        """Queues a job and returns its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, payload, models, progress, status_text, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 0, '', ?, ?)",
+                (job_id, QUEUED, json.dumps(payload, ensure_ascii=False), json.dumps(models or [], ensure_ascii=False), now, now)
+            )
+            self._conn.commit()
+        with self._wake_up:
+            self._wake_up.notify()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, payload, models, progress, status_text, result, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, status, payload, models, progress, status_text, result, error, created_at, updated_at = row
+        return Job(job_id, status, json.loads(payload), json.loads(models), progress, status_text,
+                   result, error, created_at, updated_at)
+
+    def queue_position(self, job_id: str) -> int:
+        """How many queued jobs are ahead of this one."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < (SELECT created_at FROM jobs WHERE id = ?)",
+                (QUEUED, job_id)
+            ).fetchone()
+        return row[0]
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def _update_model(self, job_id, model):
+        with self._lock:
+            row = self._conn.execute("SELECT models FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            models = [model if existing['title'] == model['title'] else existing for existing in json.loads(row[0])]
+            self._conn.execute(
+                "UPDATE jobs SET models = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(models, ensure_ascii=False), time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def _claim(self):
+        # Oldest queued job first; the status check keeps two workers from taking the same job
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, lease_until = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, self.owner, now + self.lease, now, row[0], QUEUED)
+            ).rowcount
+            self._conn.commit()
+        return row[0] if claimed else None
+
+    def _work(self):
+        while True:
+            job_id = self._claim()
+            if job_id is None:
+                with self._wake_up:
+                    self._wake_up.wait(timeout=1)
+                continue
+            job = self.get(job_id)
+            try:
+                result = asyncio.run(self.handler(job.payload, JobReporter(self, job_id)))
+                self._update(job_id, status=DONE, result=result, progress=1.0)
+            except Exception as e:
+                print(f"Job {job_id} failed: {str(e)}")
+                self._update(job_id, status=FAILED, error=str(e))
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """Returns the process-wide comparison job queue, with its workers started."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(run_comparison_job)
+            _job_queue.start()
+        return _job_queue
@@ -0,0 +1,281 @@
+import os
+import asyncio
+import hashlib
+import mimetypes
+import threading
+import contextlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Union, Literal, BinaryIO, Optional, List
+
+from utils.config import load_config
+from utils.http_client import HttpClient, get_http_client
+from utils.imgur_uploader import ImgurUploader, NO_IMAGE_URL, get_imgur_uploader
+from utils.disk_cache import DiskCache
+
+# Load environment variables from .env file
+load_config()
+
+Media = Union[bytes, BinaryIO]
+
+@dataclass
+class GeneratedMedia:
+    """
+    The output of a generator, before it is stored.
+
+    Exactly one of data (bytes in memory), path (a local file, e.g. a gradio output)
+    or url (media that is already public, e.g. an Unsplash photo) is set.
+    """
+    media_type: Literal["image", "video"]
+    title: str
+    description: str
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+    url: Optional[str] = None
+    content_type: Optional[str] = None
+    filename: Optional[str] = None
+
+    @contextlib.contextmanager
+    def open(self):
+        """Yields the payload as bytes or as an open binary file."""
+        if self.path:
+            with open(self.path, "rb") as file:
+                yield file
+        else:
+            yield self.data
+
+def hash_media(media: Media) -> str:
+    """SHA-256 of the media content. File objects are rewound afterwards."""
+    if isinstance(media, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(media).hexdigest()
+    digest = hashlib.sha256()
+    media.seek(0)
+    for chunk in iter(lambda: media.read(64 * 1024), b""):
+        digest.update(chunk)
+    media.seek(0)
+    return digest.hexdigest()
+
+def guess_extension(media_type, content_type=None, filename=None):
+    if filename and os.path.splitext(filename)[1]:
+        return os.path.splitext(filename)[1].lower()
+    if content_type:
+        extension = mimetypes.guess_extension(content_type.split(';')[0].strip())
+        if extension:
+            return extension
+    return '.mp4' if media_type == "video" else '.png'
+
+class MediaStore(ABC):
+    """
+    Where generated media is kept.
+
+    Writes are deduplicated by content hash: saving the same bytes twice returns the
+    existing URL without storing them again. save() must be awaited on the shared http
+    client loop, which is where generators run.
+    """
+    @abstractmethod
+    async def save(
+        self, media: Media, media_type: Literal["image", "video"],
+        title: str = "AI Generated Media",
+        description: str = "This media was generated by an AI model",
+        content_type: str = None, filename: str = None
+    ) -> str:
+        """
+        Stores the media and returns its public URL.
+
+        :param media: The media bytes, or a binary file object opened for reading.
+        :param media_type: Type of media, either "image" or "video".
+        :param title: Title for the media.
+        :param description: Description for the media.
+        :param content_type: Optional MIME type of the media.
+        :param filename: Optional original file name, used for its extension.
+        """
+
+    async def save_generated(self, media: GeneratedMedia) -> str:
+        """Stores a generator's output and returns its public URL."""
+        if media.url:
+            return media.url
+        with media.open() as payload:
+            return await self.save(
+                payload, media.media_type, media.title, media.description,
+                content_type=media.content_type, filename=media.filename or (media.path and os.path.basename(media.path))
+            )
+
+    async def save_many(self, media_list: List[GeneratedMedia]) -> list:
+        """
+        Stores a batch concurrently. Returns one URL per item, in order, or the
+        exception that item raised.
+        """
+        return await asyncio.gather(*(self.save_generated(media) for media in media_list), return_exceptions=True)
+
+class ImgurMediaStore(MediaStore):
+    """Uploads to Imgur. Known hashes are remembered so identical media is uploaded once."""
+    def __init__(self, uploader: ImgurUploader = None, http_client: HttpClient = None, index: DiskCache = None):
+        self._uploader = uploader
+        self.http = http_client or get_http_client()
+        self.index = index or DiskCache(
+            os.getenv("MEDIA_INDEX_PATH", os.path.join("cache", "cache.db")), table="imgur_media"
+        )
+
+    @property
+    def uploader(self) -> ImgurUploader:
+        if self._uploader is None:
+            self._uploader = get_imgur_uploader()
+        return self._uploader
+
+    async def save(self, media, media_type, title="AI Generated Media",
+                   description="This media was generated by an AI model", content_type=None, filename=None):
+        content_hash = hash_media(media)
+        existing_url = self.index.get(content_hash)
+        if existing_url:
+            return existing_url
+        media_url = await self.uploader.upload_media_stream(
+            self.http.session, media, media_type, title, description,
+            filename=filename or content_hash + guess_extension(media_type, content_type),
+            content_type=content_type
+        )
+        if media_url != NO_IMAGE_URL:
+            self.index.set(content_hash, media_url)
+        return media_url
+
+    def _upload_batch(self, media_list):
+        # Runs in a worker thread: opens every payload, then lets ImgurUploader.upload_multiple
+        # upload them concurrently on its own thread pool
+        with contextlib.ExitStack() as stack:
+            items = [
+                (stack.enter_context(media.open()), media.media_type, media.title, media.description)
+                for media in media_list
+            ]
+            return self.uploader.upload_multiple(items)
+
+    async def save_many(self, media_list):
+        results = [None] * len(media_list)
+        pending = []  # (position, content hash, media)
+        for position, media in enumerate(media_list):
+            if media.url:
+                results[position] = media.url
+                continue
+            with media.open() as payload:
+                content_hash = await asyncio.to_thread(hash_media, payload)
+            results[position] = self.index.get(content_hash)
+            if results[position] is None:
+                pending.append((position, content_hash, media))
+
+        if pending:
+            try:
+                media_urls = await asyncio.to_thread(self._upload_batch, [media for _, _, media in pending])
+            except Exception as e:
+                media_urls = [e] * len(pending)
+            for (position, content_hash, _), media_url in zip(pending, media_urls):
+                if isinstance(media_url, str) and media_url != NO_IMAGE_URL:
+                    self.index.set(content_hash, media_url)
+                results[position] = media_url
+        return results
+
+class LocalMediaStore(MediaStore):
+    """
+    Writes media to a local folder served by the app itself.
+
+    With the default folder, Streamlit's static file serving (enableStaticServing in
+    .streamlit/config.toml) exposes the files under /app/static/generated.
+    """
+    def __init__(self, root: str = None, base_url: str = None):
+        self.root = root or os.getenv("LOCAL_MEDIA_DIR", os.path.join("static", "generated"))
+        self.base_url = (base_url or os.getenv("LOCAL_MEDIA_BASE_URL", "/app/static/generated")).rstrip('/')
+        os.makedirs(self.root, exist_ok=True)
+
+    def _write(self, media, file_path):
+        if os.path.exists(file_path):
+            return
+        temp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            if isinstance(media, (bytes, bytearray, memoryview)):
+                file.write(media)
+            else:
+                media.seek(0)
+                for chunk in iter(lambda: media.read(64 * 1024), b""):
+                    file.write(chunk)
+        os.replace(temp_path, file_path)
+
+    async def save(self, media, media_type, title="AI Generated Media",
+                   description="This media was generated by an AI model", content_type=None, filename=None):
+        file_name = hash_media(media) + guess_extension(media_type, content_type, filename)
+        await asyncio.to_thread(self._write, media, os.path.join(self.root, file_name))
+        return f"{self.base_url}/{file_name}"
+
+    def path(self, url: str) -> Optional[str]:
+        """The file behind a URL returned by save(), or None for any other URL."""
+        if not url.startswith(self.base_url + "/"):
+            return None
+        return os.path.join(self.root, os.path.basename(url))
+
+    @staticmethod
+    def _read(file_path):
+        with open(file_path, "rb") as file:
+            return file.read()
+
+    async def read(self, url: str) -> bytes:
+        """The content of media saved earlier, read in a worker thread."""
+        file_path = self.path(url)
+        if file_path is None:
+            raise ValueError(f"{url} is not in the local media store")
+        return await asyncio.to_thread(self._read, file_path)
+
+class S3MediaStore(MediaStore):
+    """Writes media to an S3-compatible bucket (AWS S3, MinIO, ...). Requires boto3."""
+    def __init__(self, bucket: str = None, endpoint_url: str = None, public_base_url: str = None, prefix: str = None):
+        # Only imported when the S3 store is used: boto3 is slow to import
+        try:
+            import boto3
+        except ImportError:
+            raise ValueError("boto3 is required for the S3 media store. Install it with 'pip install boto3'.")
+        self.bucket = bucket or os.getenv("S3_BUCKET")
+        if not self.bucket:
+            raise ValueError("S3_BUCKET must be set in environment variables")
+        self.endpoint_url = endpoint_url or os.getenv("S3_ENDPOINT_URL")
+        self.prefix = (prefix if prefix is not None else os.getenv("S3_PREFIX", "generated")).strip('/')
+        default_base_url = f"{self.endpoint_url.rstrip('/')}/{self.bucket}" if self.endpoint_url else f"https://{self.bucket}.s3.amazonaws.com"
+        self.public_base_url = (public_base_url or os.getenv("S3_PUBLIC_BASE_URL", default_base_url)).rstrip('/')
+        self.client = boto3.client("s3", endpoint_url=self.endpoint_url)
+
+    def _exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    def _write(self, media, key, content_type):
+        if self._exists(key):
+            return
+        if not isinstance(media, (bytes, bytearray, memoryview)):
+            media.seek(0)
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=media,
+                               ContentType=content_type or "application/octet-stream")
+
+    async def save(self, media, media_type, title="AI Generated Media",
+                   description="This media was generated by an AI model", content_type=None, filename=None):
+        extension = guess_extension(media_type, content_type, filename)
+        key = f"{self.prefix}/{hash_media(media)}{extension}" if self.prefix else hash_media(media) + extension
+        content_type = content_type or mimetypes.types_map.get(extension)
+        await asyncio.to_thread(self._write, media, key, content_type)
+        return f"{self.public_base_url}/{key}"
+
+MEDIA_STORES = {
+    'imgur': ImgurMediaStore,
+    'local': LocalMediaStore,
+    's3': S3MediaStore,
+}
+
+_media_store = None
+_media_store_lock = threading.Lock()
+
+def get_media_store() -> MediaStore:
+    """Returns the process-wide media store selected by the MEDIA_STORE environment variable."""
+    global _media_store
+    with _media_store_lock:
+        if _media_store is None:
+            backend = os.getenv("MEDIA_STORE", "imgur").lower()
+            if backend not in MEDIA_STORES:
+                raise ValueError(f"Unknown MEDIA_STORE '{backend}', expected one of: {', '.join(MEDIA_STORES)}")
+            _media_store = MEDIA_STORES[backend]()
+        return _media_store
@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+import contextlib
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.config import load_config
+
+# Load environment variables from .env file
+load_config()
+
+# Upper bounds in seconds, from a cache hit to a cold video model
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+LABELS = ("stage", "generation_app", "model", "status")
+
+class Span:
+    """One timed stage. Call fail() to record it as an error without raising."""
+    def __init__(self, stage, generation_app=None, model=None):
+        self.stage = stage
+        self.generation_app = generation_app or ""
+        self.model = model or ""
+        self.status = "ok"
+        self.duration = None
+
+    def fail(self):
+        self.status = "error"
+
+class Metrics:
+    """
+    Timing spans for every stage of a comparison (translation, provider request, download,
+    image conversion, upload, render, Telegram, ...).
+
+    Each span is aggregated into a Prometheus-style histogram, labelled by stage,
+    generation_app, model and status. The histograms are served by start_metrics_server().
+
+    Spans are also appended to a JSONL trace file if trace_path (METRICS_TRACE_PATH) is
+    set; it is off by default. Once the file reaches trace_max_bytes it is moved to
+    <trace_path>.1, replacing the previous one, so a trace never takes more than twice
+    that. Writes happen under their own lock, never the histograms'.
+    """
+    def __init__(self, trace_path: str = None, trace_max_bytes: int = None):
+        self.trace_path = trace_path if trace_path is not None else os.getenv("METRICS_TRACE_PATH", "")
+        self.trace_max_bytes = trace_max_bytes or int(float(os.getenv("METRICS_TRACE_MAX_MB", 50)) * 1024 * 1024)
+        self._histograms = defaultdict(lambda: [[0] * (len(BUCKETS) + 1), 0.0])  # labels -> (bucket counts, sum)
+        self._lock = threading.Lock()
+        self._trace_lock = threading.Lock()
+        self._trace_file = None
+
+    @contextlib.contextmanager
+    def span(self, stage: str, generation_app: str = None, model: str = None):
+        """
+        Times the enclosed block. Works around awaits as well, since the span only reads
+        the clock on entry and exit. An exception marks the span as an error.
+        """
+        span = Span(stage, generation_app, model)
+        started_at = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.fail()
+            raise
+        finally:
+            span.duration = time.perf_counter() - started_at
+            self.observe(span)
+
+    def observe(self, span: Span):
+        labels = (span.stage, span.generation_app, span.model, span.status)
+        with self._lock:
+            counts, _ = histogram = self._histograms[labels]
+            counts[bisect.bisect_left(BUCKETS, span.duration)] += 1
+            histogram[1] += span.duration
+        if self.trace_path:
+            self._write_trace(span)
+
+    def _write_trace(self, span):
+        line = json.dumps({
+            'ts': time.time(),
+            'stage': span.stage,
+            'generation_app': span.generation_app,
+            'model': span.model,
+            'status': span.status,
+            'duration': round(span.duration, 6),
+        }, ensure_ascii=False) + "\n"
+        with self._trace_lock:
+            if not self.trace_path:
+                return
+            try:
+                if self._trace_file is None:
+                    os.makedirs(os.path.dirname(self.trace_path) or ".", exist_ok=True)
+                    self._trace_file = open(self.trace_path, "a", encoding="utf-8", buffering=1)
+                elif self._trace_file.tell() >= self.trace_max_bytes:
+                    self._trace_file.close()
+                    os.replace(self.trace_path, self.trace_path + ".1")
+                    self._trace_file = open(self.trace_path, "a", encoding="utf-8", buffering=1)
+                self._trace_file.write(line)
+            except OSError as e:
+                print(f"Error writing trace to {self.trace_path}: {str(e)}")
+                self.trace_path = None
+
+    def render(self) -> str:
+        """The histograms in the Prometheus text exposition format."""
+        lines = [
+            "# HELP generation_stage_seconds Time spent in each stage of a comparison.",
+            "# TYPE generation_stage_seconds histogram",
+        ]
+        with self._lock:
+            histograms = [(labels, list(counts), total) for labels, (counts, total) in self._histograms.items()]
+        for labels, counts, total in sorted(histograms):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(LABELS, labels))
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'generation_stage_seconds_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"generation_stage_seconds_sum{{{label_text}}} {total}")
+            lines.append(f"generation_stage_seconds_count{{{label_text}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+_metrics = None
+_metrics_lock = threading.Lock()
+_metrics_server = None
+
+def get_metrics() -> Metrics:
+    """Returns the process-wide metrics."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
+
+def span(stage: str, generation_app: str = None, model: str = None):
+    """Shortcut for get_metrics().span()."""
+    return get_metrics().span(stage, generation_app, model)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics().render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(host: str = None, port: int = None):
+    """
+    Serves /metrics once per process in a background thread. Set METRICS_PORT to 0 to
+    disable it. If the port is taken (e.g. by another app process), the endpoint is skipped.
+    """
+    global _metrics_server
+    host = host or os.getenv("METRICS_HOST", "127.0.0.1")
+    port = port if port is not None else int(os.getenv("METRICS_PORT", 9464))
+    with _metrics_lock:
+        if _metrics_server is not None or not port:
+            return
+        try:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            print(f"Metrics endpoint not started on {host}:{port}: {str(e)}")
+            _metrics_server = False
+            return
+    threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+
+def summarize_trace(path: str):
+    """Prints the count and p50/p95/p99 of every stage and model in a JSONL trace file."""
+    durations = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            durations[(record['stage'], record['model'] or record['generation_app'] or "-")].append(record['duration'])
+
+    def percentile(values, q):
+        return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+    print(f"{'stage':<20} {'model':<45} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for (stage, model), values in sorted(durations.items()):
+        values.sort()
+        print(f"{stage:<20} {model[:45]:<45} {len(values):>6} "
+              f"{percentile(values, 50):>8.3f} {percentile(values, 95):>8.3f} {percentile(values, 99):>8.3f}")
+
+if __name__ == "__main__":
+    summarize_trace(sys.argv[1] if len(sys.argv) > 1 else os.getenv("METRICS_TRACE_PATH") or os.path.join("logs", "trace.jsonl"))
@@ -0,0 +1,148 @@
+import os
+import time
+import threading
+from collections import deque
+
+from utils.config import load_config
+
+# Load environment variables from .env file
+load_config()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+def health_key(model) -> str:
+    """
+    The unit of health tracking. Pollinations serves many models from one generation_app,
+    so those are tracked by name; every other generation_app is a single backend.
+    """
+    if model['generation_app'] == 'pollinations':
+        return f"pollinations/{model.get('name')}"
+    return model['generation_app']
+
+class CircuitBreaker:
+    """
+    Tracks one model's recent failures and latency.
+
+    After failure_threshold consecutive failures the circuit opens and requests fail fast.
+    Once reset_timeout seconds have passed, a single probe request is let through (half
+    open): success closes the circuit, failure opens it again for another reset_timeout.
+    """
+    def __init__(self, failure_threshold: int, reset_timeout: float, latency_window: int):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.latencies = deque(maxlen=latency_window)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now. In half open state, only one probe is in flight at a time."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.latencies.append(latency)
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"Circuit opened after {self.consecutive_failures} consecutive failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """Gives up a probe slot without an outcome, e.g. when the request was cancelled."""
+        with self._lock:
+            self._probing = False
+
+    def is_available(self) -> bool:
+        """Whether requests currently go through, without claiming a probe."""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return True
+
+    def percentile(self, q: float):
+        """The q-th percentile (0-100) of recent successful latencies in seconds, or None without data."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(q / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+class ModelHealth:
+    """
+    Circuit breakers for every model, shared by all sessions.
+
+    Keeps a dead model (a cold Hugging Face model, a Space that is down) from sitting in
+    generator retries on every comparison.
+    """
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None, latency_window: int = None):
+        self.failure_threshold = failure_threshold or int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 3))
+        self.reset_timeout = reset_timeout or float(os.getenv("CIRCUIT_RESET_TIMEOUT", 60))
+        self.latency_window = latency_window or int(os.getenv("CIRCUIT_LATENCY_WINDOW", 50))
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, model) -> CircuitBreaker:
+        key = health_key(model)
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout, self.latency_window)
+            return self._breakers[key]
+
+    def allow(self, model) -> bool:
+        return self.breaker(model).allow()
+
+    def record_success(self, model, latency: float):
+        self.breaker(model).record_success(latency)
+
+    def record_failure(self, model):
+        self.breaker(model).record_failure()
+
+    def release(self, model):
+        self.breaker(model).release()
+
+    def is_available(self, model) -> bool:
+        return self.breaker(model).is_available()
+
+    def status_label(self, model) -> str:
+        """A short health badge for the model picker: state and median latency."""
+        breaker = self.breaker(model)
+        if not breaker.is_available():
+            return "🔴 לא זמין זמנית"
+        median = breaker.percentile(50)
+        badge = "🟡" if breaker.state != CLOSED else "🟢"
+        if median is None:
+            return badge if breaker.state != CLOSED else ""
+        return f"{badge} ~{median:.1f}s"
+
+_model_health = None
+_model_health_lock = threading.Lock()
+
+def get_model_health() -> ModelHealth:
+    """Returns the process-wide model health tracker."""
+    global _model_health
+    with _model_health_lock:
+        if _model_health is None:
+            _model_health = ModelHealth()
+        return _model_health
@@ -0,0 +1,227 @@
+import os
+import io
+import json
+import time
+import base64
+import shutil
+import asyncio
+import zipfile
+import tempfile
+import threading
+import subprocess
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+from PIL import Image, ImageSequence
+
+from utils.config import load_config
+from utils.http_client import HttpClient, get_http_client
+from utils.media_store import LocalMediaStore, get_media_store
+from utils.thumbnails import video_first_frame
+from utils.comparison import render_comparison
+
+# Load environment variables from .env file
+load_config()
+
+INLINE = "inline"
+ZIP = "zip"
+
+@dataclass
+class ExportedMedia:
+    title: str
+    status: str  # "embedded", "linked" (left as a hotlink) or "missing"
+    source_bytes: int = 0
+    exported_bytes: int = 0
+    error: Optional[str] = None
+
+@dataclass
+class ExportResult:
+    data: bytes
+    mode: str
+    file_name: str
+    elapsed: float
+    media: List[ExportedMedia] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    def summary(self) -> str:
+        embedded = sum(1 for media in self.media if media.status == "embedded")
+        source = sum(media.source_bytes for media in self.media)
+        return (f"{self.file_name}: {self.size / 1024:.0f} KB, {embedded}/{len(self.media)} media embedded "
+                f"(from {source / 1024:.0f} KB), built in {self.elapsed:.1f}s")
+
+    def manifest(self) -> dict:
+        return {'mode': self.mode, 'size': self.size, 'elapsed': round(self.elapsed, 3),
+                'media': [asdict(media) for media in self.media]}
+
+class OfflineExporter:
+    """
+    Builds a comparison page that works without the media hosts: every model's media is
+    fetched concurrently, recompressed and either inlined into the page as data URIs
+    (mode "inline") or packaged next to an index.html in a ZIP (mode "zip").
+
+    Images are scaled down to max_width and saved as WebP, lowering the quality until
+    they fit their share of max_bytes. Videos become a poster and a short clip (with
+    ffmpeg), or are kept as they are if they fit. The whole export is bounded by
+    max_bytes and timeout: media that doesn't fit or doesn't arrive in time stays a
+    hotlink, and is reported as such. The page itself counts against max_bytes, and
+    inlined media is budgeted by its base64 size.
+    """
+    def __init__(self, http_client: HttpClient = None, max_width: int = None, quality: int = None,
+                 max_bytes: int = None, timeout: float = None, concurrency: int = None):
+        self.http = http_client or get_http_client()
+        self.max_width = max_width or int(os.getenv("EXPORT_MAX_WIDTH", 1024))
+        self.quality = quality or int(os.getenv("EXPORT_QUALITY", 75))
+        self.max_bytes = max_bytes or int(float(os.getenv("EXPORT_MAX_MB", 8)) * 1024 * 1024)
+        self.timeout = timeout or float(os.getenv("EXPORT_TIMEOUT", 30))
+        self.concurrency = concurrency or int(os.getenv("EXPORT_CONCURRENCY", 6))
+        self.video_seconds = float(os.getenv("EXPORT_VIDEO_SECONDS", 3))
+
+    async def export(self, prompt: str, models: List[dict], mode: str = INLINE) -> ExportResult:
+        """
+        :param models: Models filled in by record_result(), as for render_comparison().
+        :param mode: "inline" for a single HTML file, "zip" for index.html plus a media folder.
+        """
+        started_at = time.perf_counter()
+        with_media = [model for model in models if model.get('media_url')]
+        budget = self.media_budget(prompt, models, len(with_media), mode)
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def export_one(model):
+            async with slots:
+                return await self._export_media(model, budget)
+
+        tasks = [asyncio.ensure_future(self.http.run(export_one(model))) for model in with_media]
+        done, pending = await asyncio.wait(tasks, timeout=self.timeout) if tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+
+        exported_models, report, files = [], [], {}
+        results = {id(model): task for model, task in zip(with_media, tasks)}
+        for index, model in enumerate(models):
+            model = dict(model)
+            task = results.get(id(models[index]))
+            if task is None:
+                report.append(ExportedMedia(model['title'], "missing"))
+            elif task in pending or task.exception() is not None:
+                error = "timed out" if task in pending else str(task.exception())
+                report.append(ExportedMedia(model['title'], "linked", error=error))
+            else:
+                exported, entry = task.result()
+                report.append(entry)
+                for role, (data, extension, content_type) in exported.items():
+                    name = f"media/{index + 1:02d}{'_poster' if role == 'poster' else ''}{extension}"
+                    if mode == ZIP:
+                        files[name] = data
+                        url = name
+                    else:
+                        url = f"data:{content_type};base64,{base64.b64encode(data).decode()}"
+                    model['poster_url' if role == 'poster' else 'media_url'] = url
+            exported_models.append(model)
+
+        page = render_comparison(prompt, exported_models)
+        result = ExportResult(b"", mode, "comparison_results.html" if mode == INLINE else "comparison_results.zip",
+                              0.0, report)
+        if mode == ZIP:
+            result.data = await asyncio.to_thread(self._zip, page, files, result)
+        else:
+            result.data = page
+        result.elapsed = time.perf_counter() - started_at
+        print(result.summary())
+        return result
+
+    def media_budget(self, prompt, models, count, mode) -> int:
+        """
+        Each media's share of max_bytes, in raw bytes: what is left once the page itself
+        is counted (rendered with hotlinks, as it would be without media), split evenly.
+        Inlined media is base64-encoded, 4 bytes for every 3, so gets 3/4 of its share.
+        """
+        page_bytes = len(render_comparison(prompt, models))
+        budget = max(0, self.max_bytes - page_bytes) // max(1, count)
+        return budget // 4 * 3 if mode == INLINE else budget
+
+    @staticmethod
+    def _zip(page, files, result):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("index.html", page, compress_type=zipfile.ZIP_DEFLATED)
+            # WebP and MP4 are compressed already
+            for name, data in files.items():
+                archive.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+            archive.writestr("manifest.json", json.dumps(result.manifest(), ensure_ascii=False, indent=2),
+                             compress_type=zipfile.ZIP_DEFLATED)
+        return buffer.getvalue()
+
+    async def _fetch(self, url) -> bytes:
+        if not url.startswith(("http://", "https://")):
+            # Served by the app itself (the local media store)
+            store = get_media_store()
+            if not isinstance(store, LocalMediaStore):
+                raise ValueError(f"Cannot fetch {url}")
+            return await store.read(url)
+        async with self.http.session.get(url) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    async def _export_media(self, model, budget):
+        """Returns ({role: (data, extension, content type)}, ExportedMedia) for one model."""
+        source = await self._fetch(model['media_url'])
+        if model.get('media_type') == 'video':
+            exported = await asyncio.to_thread(self._compress_video, source, budget)
+        else:
+            exported = {'media': await asyncio.to_thread(self._compress_image, source, budget)}
+        exported_bytes = sum(len(data) for data, _, _ in exported.values())
+        if not exported.get('media') or exported_bytes > budget:
+            # Too large even after recompressing, keep the hotlink
+            return {}, ExportedMedia(model['title'], "linked", len(source), 0, "over the size budget")
+        return exported, ExportedMedia(model['title'], "embedded", len(source), exported_bytes)
+
+    def _compress_image(self, source, budget, image=None):
+        image = image or Image.open(io.BytesIO(source))
+        if getattr(image, "is_animated", False):
+            image = next(ImageSequence.Iterator(image))
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        width, quality = min(self.max_width, image.width), self.quality
+        # Lower the quality, then the size, until the image fits its share of the budget
+        while True:
+            resized = image if width == image.width else image.resize(
+                (width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, format="WEBP", quality=quality)
+            if buffer.tell() <= budget or width <= 256:
+                return buffer.getvalue(), ".webp", "image/webp"
+            if quality > 40:
+                quality -= 15
+            else:
+                width = width * 3 // 4
+
+    def _compress_video(self, source, budget):
+        if shutil.which("ffmpeg") is None:
+            # Without ffmpeg, a video is only embedded as it is
+            return {'media': (source, ".mp4", "video/mp4")} if len(source) <= budget else {}
+        with tempfile.TemporaryDirectory() as directory:
+            source_path = os.path.join(directory, "source.mp4")
+            clip_path = os.path.join(directory, "clip.mp4")
+            with open(source_path, "wb") as file:
+                file.write(source)
+            poster = self._compress_image(None, budget // 4, video_first_frame(source_path))
+            subprocess.run([
+                "ffmpeg", "-loglevel", "error", "-i", source_path, "-t", str(self.video_seconds),
+                "-vf", f"scale='min({self.max_width},iw)':-2", "-c:v", "libx264", "-crf", "30", "-an",
+                "-movflags", "+faststart", clip_path
+            ], check=True)
+            with open(clip_path, "rb") as file:
+                clip = file.read()
+        return {'poster': poster, 'media': (clip, ".mp4", "video/mp4")}
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+def get_offline_exporter() -> OfflineExporter:
+    """Returns the process-wide offline exporter."""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = OfflineExporter()
+        return _exporter
@@ -0,0 +1,225 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from utils.config import load_config
+from utils.metrics import span
+
+# Load environment variables from .env file
+load_config()
+
+# "<requests>/<seconds>" per provider and API key, overridable with RATE_LIMIT_<PROVIDER>.
+# An empty value turns limiting off for that provider.
+DEFAULT_RATE_LIMITS = {
+    'huggingface': "60/60",
+    'pollinations': "60/60",
+    # Demo applications get 50 requests per hour
+    'unsplash': "50/3600",
+    'imgur': "5/1",
+    # Messages to the same group are limited to 20 per minute
+    'telegram': "20/60",
+}
+
+# Response headers that report how many requests are left, and when the quota resets.
+# Imgur reports both a client and a user quota, and a separate quota for uploads.
+REMAINING_HEADERS = ('X-RateLimit-Remaining', 'X-RateLimit-ClientRemaining', 'X-RateLimit-UserRemaining',
+                     'X-Post-Rate-Limit-Remaining')
+RESET_HEADERS = ('X-RateLimit-Reset', 'X-RateLimit-UserReset', 'X-Post-Rate-Limit-Reset')
+
+# How long to back off after a 429 without a Retry-After header
+DEFAULT_RETRY_AFTER = 10.0
+
+def parse_rate_limit(spec: str):
+    """Parses "<requests>/<seconds>" into (rate per second, burst). Returns None for no limit."""
+    if not spec:
+        return None
+    count, _, seconds = spec.partition("/")
+    count, seconds = float(count), float(seconds or 1)
+    if count <= 0:
+        return None
+    return count / seconds, count
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, which holds either seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+        return max(0.0, seconds) if math.isfinite(seconds) else None
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def parse_reset(value: str) -> Optional[float]:
+    """Seconds until a quota resets. Providers send either a Unix timestamp or a number of seconds."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(value):
+        return None
+    return max(0.0, value - time.time()) if value > 1e9 else max(0.0, value)
+
+def parse_remaining(value: str) -> Optional[int]:
+    """Requests left from a remaining header. None if it is missing or not a number."""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+class TokenBucket:
+    """
+    A token bucket holding up to capacity tokens, refilled at rate tokens per second.
+
+    reserve() never refuses: it takes the tokens, letting the balance go negative, and
+    returns how long the caller has to wait for its turn. Callers therefore queue up in
+    order instead of failing. Safe to share between threads and event loops.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.granted = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self.remaining = None  # As last reported by the provider
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        # While paused, updated lies in the future and nothing is refilled until then
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, tokens: float = 1) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= tokens
+            self.granted += 1
+            delay = max(0.0, self.updated - now) + max(0.0, -self.tokens / self.rate)
+            self.waited += delay
+            return delay
+
+    def pause(self, seconds: float):
+        """Stops handing out tokens for the given time, e.g. after a 429."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            resume_at = now + seconds
+            if resume_at > self.updated:
+                self.updated = resume_at
+            self.tokens = min(self.tokens, 0)
+
+    def sync(self, remaining: int):
+        """Trusts the provider's own count of requests left, when it is lower than ours."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.remaining = remaining
+            self.tokens = min(self.tokens, remaining)
+
+class RateLimiter:
+    """
+    Shared token buckets, one per provider and API key, so every session and worker
+    draws on the same quota.
+
+    Callers acquire a token before each request, and hand the response to observe()
+    so the bucket adapts to what the provider reports: Retry-After on a 429, and the
+    X-RateLimit-* remaining and reset headers.
+    """
+    def __init__(self, limits: dict = None):
+        limits = limits or {
+            provider: os.getenv(f"RATE_LIMIT_{provider.upper()}", spec)
+            for provider, spec in DEFAULT_RATE_LIMITS.items()
+        }
+        self.limits = {provider: parse_rate_limit(spec) for provider, spec in limits.items()}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, provider: str, key: str = None) -> Optional[TokenBucket]:
+        limit = self.limits.get(provider)
+        if limit is None:
+            return None
+        with self._lock:
+            if (provider, key) not in self._buckets:
+                self._buckets[(provider, key)] = TokenBucket(*limit)
+            return self._buckets[(provider, key)]
+
+    async def acquire(self, provider: str, key: str = None, tokens: float = 1):
+        """Waits until the request may be sent."""
+        bucket = self.bucket(provider, key)
+        delay = bucket.reserve(tokens) if bucket else 0
+        if delay > 0:
+            with span("rate_limit_wait", provider):
+                await asyncio.sleep(delay)
+
+    def acquire_blocking(self, provider: str, key: str = None, tokens: float = 1):
+        """Like acquire(), for code running in a worker thread."""
+        bucket = self.bucket(provider, key)
+        delay = bucket.reserve(tokens) if bucket else 0
+        if delay > 0:
+            with span("rate_limit_wait", provider):
+                time.sleep(delay)
+
+    def observe(self, provider: str, key: str, status: int, headers) -> Optional[float]:
+        """
+        Updates the bucket from a response. Returns the number of seconds the provider
+        asked to back off, or None if it did not.
+        """
+        bucket = self.bucket(provider, key)
+        if bucket is None:
+            return None
+        # A malformed header is skipped, not allowed to fail an otherwise good response
+        remaining = [count for name in REMAINING_HEADERS if (count := parse_remaining(headers.get(name))) is not None]
+        if remaining:
+            bucket.sync(min(remaining))
+        backoff = None
+        if status == 429:
+            bucket.throttled += 1
+            backoff = parse_retry_after(headers.get('Retry-After'))
+            if backoff is None:
+                backoff = DEFAULT_RETRY_AFTER
+        elif remaining and min(remaining) <= 0:
+            # Quota used up: wait for the reset rather than collecting 429s
+            resets = [reset for name in RESET_HEADERS if (reset := parse_reset(headers.get(name))) is not None]
+            backoff = min(resets) if resets else None
+        if backoff:
+            print(f"Rate limited by {provider}, pausing for {backoff:.0f}s")
+            bucket.pause(backoff)
+        return backoff
+
+    def stats(self) -> dict:
+        """Quota accounting per provider: requests let through, 429s seen, time spent waiting, last reported remaining."""
+        with self._lock:
+            buckets = list(self._buckets.items())
+        stats = {}
+        for (provider, _), bucket in buckets:
+            entry = stats.setdefault(provider, {'granted': 0, 'throttled': 0, 'waited': 0.0, 'remaining': None})
+            entry['granted'] += bucket.granted
+            entry['throttled'] += bucket.throttled
+            entry['waited'] += bucket.waited
+            if bucket.remaining is not None:
+                entry['remaining'] = bucket.remaining if entry['remaining'] is None else min(entry['remaining'], bucket.remaining)
+        return stats
+
+class RateLimitedError(Exception):
+    """Raised when a provider answered 429, so retry decorators try again after the pause."""
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide rate limiter."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
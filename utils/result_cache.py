@@ -0,0 +1,74 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Optional
+
+from utils.config import load_config
+from utils.disk_cache import DiskCache
+from utils.imgur_uploader import NO_IMAGE_URL
+
+# Load environment variables from .env file
+load_config()
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split()).casefold()
+
+def make_cache_key(prompt: str, model: dict, style: str = "", seed=None) -> str:
+    """A content address for one generation: normalized prompt, generation_app, model name, style, seed and enhance."""
+    key_parts = {
+        'prompt': normalize_prompt(prompt),
+        'generation_app': model['generation_app'],
+        'name': model.get('name'),
+        'style': (style or "").strip(),
+        'seed': seed if seed is not None else model.get('seed'),
+        'enhance': bool(model.get('enhance', False)),
+    }
+    return hashlib.sha256(json.dumps(key_parts, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """
+    Persistent cache of generated media URLs.
+
+    Only models marked "cacheable" in data/models.json (deterministic providers, such as
+    Pollinations with its fixed seed) are cached by default, and never those with
+    "enhance", whose prompt is rewritten by an LLM on every request. Callers can force
+    caching on or off per request with use_cache.
+    """
+    def __init__(self, path: str = None, ttl: float = None, max_entries: int = None):
+        self.store = DiskCache(
+            path or os.getenv("RESULT_CACHE_PATH", os.path.join("cache", "cache.db")),
+            table="results",
+            ttl=ttl or float(os.getenv("RESULT_CACHE_TTL", 7 * 24 * 3600)),
+            max_entries=max_entries or int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 5000))
+        )
+
+    @staticmethod
+    def is_cacheable(model: dict, use_cache: bool = None) -> bool:
+        if use_cache is not None:
+            return use_cache
+        return bool(model.get('cacheable', False)) and not model.get('enhance', False)
+
+    def get(self, prompt: str, model: dict, style: str = "", seed=None) -> Optional[str]:
+        value = self.store.get(make_cache_key(prompt, model, style, seed))
+        if value is None:
+            return None
+        return json.loads(value)['media_url']
+
+    def set(self, prompt: str, model: dict, media_url: str, style: str = "", seed=None):
+        # Never remember failures, so the next request tries again
+        if not media_url or media_url == NO_IMAGE_URL:
+            return
+        value = json.dumps({'media_url': media_url})
+        self.store.set(make_cache_key(prompt, model, style, seed), value)
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache() -> ResultCache:
+    """Returns the process-wide result cache."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
@@ -0,0 +1,29 @@
+import asyncio
+from typing import Callable, Awaitable, Hashable
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first call does the work, and
+    callers that arrive while it is in flight wait for the same result instead of
+    repeating it. Nothing is remembered once the call finishes.
+
+    Every call must come from the same event loop (the generation engine only uses it
+    from the shared http client loop).
+    """
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable]):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            print(f"Joining in-flight generation {key}")
+        # A waiter that gives up (e.g. its comparison deadline passed) must not cancel
+        # the call for the others
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,190 @@
+import os
+import random
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Optional, Union, List
+
+from utils.config import load_config
+from utils.http_client import HttpClient, get_http_client
+from utils.TelegramSender import TelegramSender
+from utils.metrics import get_metrics
+
+# Load environment variables from .env file
+load_config()
+
+# sendMediaGroup takes 2-10 items
+MAX_GROUP_SIZE = 10
+
+@dataclass
+class Delivery:
+    """One outbound Telegram notification."""
+    type: str  # "photo", "document" or "message"
+    media: Union[bytes, str, None] = None  # Bytes to upload, or a URL for Telegram to fetch
+    caption: Optional[str] = None
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    attempts: int = 0
+
+class TelegramDelivery:
+    """
+    Sends Telegram notifications from a long-lived background worker, so a comparison
+    never waits for its Telegram copy.
+
+    Senders queue a delivery and return at once. The worker runs on the shared http client
+    loop and sends through its session, verifies the bot token once, and waits
+    batch_window seconds after the first delivery so that photos (or documents) queued
+    close together go out as one sendMediaGroup album. Failed sends are queued again
+    with a growing delay, up to max_attempts tries.
+    """
+    def __init__(self, http_client: HttpClient = None, queue_size: int = None, batch_window: float = None,
+                 max_attempts: int = None, retry_delay: float = None):
+        self.http = http_client or get_http_client()
+        self.queue_size = queue_size or int(os.getenv("TELEGRAM_QUEUE_SIZE", 100))
+        self.batch_window = batch_window if batch_window is not None else float(os.getenv("TELEGRAM_BATCH_WINDOW", 2))
+        self.max_attempts = max_attempts or int(os.getenv("TELEGRAM_MAX_ATTEMPTS", 5))
+        self.retry_delay = retry_delay or float(os.getenv("TELEGRAM_RETRY_DELAY", 5))
+        self.sender = None
+        # Set once the bot token has been checked
+        self.verified = False
+        # Set when Telegram isn't configured
+        self.disabled = False
+        self.sent = 0
+        self.dropped = 0
+        self._queue = None
+        self._worker_task = None
+
+    def start(self):
+        """Starts the worker and verifies the bot token, without waiting for either."""
+        self.http.loop.call_soon_threadsafe(self._ensure_worker)
+
+    def enqueue(self, delivery: Delivery):
+        """Queues a delivery from any thread or event loop. Never blocks."""
+        self.http.loop.call_soon_threadsafe(self._put, delivery)
+
+    def send_document(self, document: bytes, caption: str = None, filename: str = "comparison_results.html",
+                      content_type: str = "text/html"):
+        self.enqueue(Delivery("document", document, caption, filename, content_type))
+
+    def send_photo(self, photo: Union[bytes, str], caption: str = None):
+        self.enqueue(Delivery("photo", photo, caption, "generated_image.png", "image/png"))
+
+    def send_message(self, text: str):
+        self.enqueue(Delivery("message", caption=text))
+
+    def _ensure_worker(self):
+        # The queue and worker live on the shared loop, created on first use
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._worker_task = asyncio.ensure_future(self._worker())
+
+    def _put(self, delivery):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(delivery)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print(f"Telegram queue is full, dropping a {delivery.type}")
+
+    async def _verify(self) -> bool:
+        if self.sender is None:
+            try:
+                self.sender = TelegramSender(self.http)
+            except ValueError as e:
+                print(f"Telegram notifications are disabled: {str(e)}")
+                self.disabled = True
+                return False
+        if not self.verified:
+            # Only a successful check is kept: a failure may be a passing outage, so the
+            # token is checked again on the next send, which is retried meanwhile
+            if await self.sender.verify_bot_token():
+                self.verified = True
+            else:
+                print("Telegram bot token verification failed")
+                return False
+        return self.verified
+
+    async def _worker(self):
+        try:
+            await self._verify()
+        except Exception as e:
+            print(f"Telegram bot token could not be checked yet: {str(e)}")
+        while True:
+            batch = [await self._queue.get()]
+            # Let deliveries queued close together join the same album
+            if self.batch_window and self._queue.qsize() < MAX_GROUP_SIZE:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < MAX_GROUP_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            for group in self._group(batch):
+                await self._send(group)
+            for _ in batch:
+                self._queue.task_done()
+
+    @staticmethod
+    def _group(batch: List[Delivery]) -> List[List[Delivery]]:
+        # An album holds either photos or documents; text messages go out one by one
+        photos = [delivery for delivery in batch if delivery.type == "photo"]
+        documents = [delivery for delivery in batch if delivery.type == "document"]
+        messages = [[delivery] for delivery in batch if delivery.type == "message"]
+        return [group for group in (photos, documents) if group] + messages
+
+    async def _send(self, group: List[Delivery]):
+        try:
+            if not await self._verify():
+                if self.disabled:
+                    self.dropped += len(group)
+                    return
+                raise Exception("Bot token verification failed")
+            with get_metrics().span("telegram"):
+                if len(group) > 1:
+                    result = await self.sender.send_media_group([
+                        {'type': delivery.type, 'media': delivery.media, 'caption': delivery.caption,
+                         'filename': delivery.filename, 'content_type': delivery.content_type}
+                        for delivery in group
+                    ])
+                else:
+                    result = await self._send_one(group[0])
+        except Exception as e:
+            print(f"Failed to send to Telegram: {str(e)}")
+            result = None
+        if result:
+            self.sent += len(group)
+            return
+        for delivery in group:
+            self._retry(delivery)
+
+    async def _send_one(self, delivery: Delivery):
+        if delivery.type == "message":
+            return await self.sender.send_message(delivery.caption)
+        if delivery.type == "photo" and isinstance(delivery.media, str):
+            return await self.sender.send_photo_url(delivery.media, caption=delivery.caption)
+        if delivery.type == "photo":
+            return await self.sender.send_photo_bytes(delivery.media, caption=delivery.caption)
+        return await self.sender.send_document(delivery.media, caption=delivery.caption,
+                                               filename=delivery.filename, content_type=delivery.content_type)
+
+    def _retry(self, delivery: Delivery):
+        delivery.attempts += 1
+        if delivery.attempts >= self.max_attempts:
+            self.dropped += 1
+            print(f"Giving up on a Telegram {delivery.type} after {delivery.attempts} attempts")
+            return
+        # Exponential backoff with jitter, so a Telegram outage isn't hammered
+        delay = random.uniform(0.5, 1.0) * self.retry_delay * 2 ** (delivery.attempts - 1)
+        self.http.loop.call_later(delay, self._put, delivery)
+
+_telegram_delivery = None
+_telegram_delivery_lock = threading.Lock()
+
+def get_telegram_delivery() -> TelegramDelivery:
+    """Returns the process-wide Telegram delivery worker."""
+    global _telegram_delivery
+    with _telegram_delivery_lock:
+        if _telegram_delivery is None:
+            _telegram_delivery = TelegramDelivery()
+        return _telegram_delivery
+
+def start_telegram_delivery():
+    """Starts the Telegram worker once per process, so the bot token is checked before the first send."""
+    get_telegram_delivery().start()
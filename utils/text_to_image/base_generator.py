@@ -0,0 +1,125 @@
+import os
+import asyncio
+import functools
+import threading
+import concurrent.futures
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from utils.http_client import HttpClient, get_http_client
+from utils.media_store import MediaStore, GeneratedMedia, get_media_store
+from utils.rate_limiter import get_rate_limiter
+
+_prediction_executor = None
+_prediction_executor_lock = threading.Lock()
+
+def get_prediction_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """
+    The threads gradio predictions block on. Kept apart from the loop's default executor,
+    which the media stores write through, so hung Spaces can't hold up uploads.
+    """
+    global _prediction_executor
+    with _prediction_executor_lock:
+        if _prediction_executor is None:
+            _prediction_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=int(os.getenv("GRADIO_WORKERS", 4)), thread_name_prefix="gradio-predict"
+            )
+        return _prediction_executor
+
+def make_gradio_client(src: str, **kwargs):
+    """A gradio Client whose HTTP requests time out after GRADIO_HTTP_TIMEOUT seconds."""
+    from gradio_client import Client
+    return Client(src, httpx_kwargs={'timeout': float(os.getenv("GRADIO_HTTP_TIMEOUT", 60))}, **kwargs)
+
+class BaseGenerator(ABC):
+    """
+    Async interface shared by every media generator.
+
+    Subclasses implement _generate(), which only produces the media. Storing it is a
+    separate pipeline stage (see UploadPipeline), or generate_and_store() for one-off
+    calls. _generate() always runs on the shared http client loop, so it can use
+    self.http.session directly. Blocking work should go through run_blocking(), and
+    gradio predictions through run_prediction(), to keep that loop free.
+    """
+    def __init__(self, http_client: HttpClient = None, store: MediaStore = None):
+        self.http = http_client or get_http_client()
+        self._store = store
+        # Set when a long-lived handle (e.g. a gradio Client) stops working, so the
+        # generator registry builds a fresh instance on the next request
+        self.stale = False
+
+    @property
+    def store(self) -> MediaStore:
+        if self._store is None:
+            self._store = get_media_store()
+        return self._store
+
+    def mark_stale(self):
+        self.stale = True
+
+    @abstractmethod
+    async def _generate(self, prompt, *args, **kwargs) -> Optional[GeneratedMedia]:
+        """Generates media for the prompt, or returns None on failure."""
+
+    async def generate(self, prompt, *args, **kwargs) -> Optional[GeneratedMedia]:
+        """Awaitable from any event loop."""
+        return await self.http.run(self._generate(prompt, *args, **kwargs))
+
+    async def generate_and_store(self, prompt, *args, **kwargs) -> Optional[str]:
+        """Generates media and stores it right away. Returns its public URL."""
+        media = await self.generate(prompt, *args, **kwargs)
+        if media is None:
+            return None
+        return await self.http.run(self.store.save_generated(media))
+
+    def generate_image(self, prompt, *args, **kwargs) -> Optional[str]:
+        """Blocking wrapper for scripts that are not async. Returns the stored media's URL."""
+        return self.http.run_sync(self.generate_and_store(prompt, *args, **kwargs))
+
+    async def _request(self, method: str, url: str, rate_limit: tuple = None, **kwargs):
+        # rate_limit is a (provider, API key) pair to draw a token from before the request
+        rate_limiter = get_rate_limiter()
+        if rate_limit:
+            await rate_limiter.acquire(*rate_limit)
+        response = await self.http.session.request(method, url, **kwargs)
+        if rate_limit:
+            rate_limiter.observe(*rate_limit, response.status, response.headers)
+        if not response.ok:
+            response.release()
+            response.raise_for_status()
+        return response
+
+    async def fetch_bytes(self, method: str, url: str, rate_limit: tuple = None, **kwargs) -> bytes:
+        async with await self._request(method, url, rate_limit, **kwargs) as response:
+            return await response.read()
+
+    async def fetch_json(self, method: str, url: str, rate_limit: tuple = None, **kwargs):
+        async with await self._request(method, url, rate_limit, **kwargs) as response:
+            return await response.json()
+
+    @staticmethod
+    async def run_blocking(func, *args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    @staticmethod
+    async def run_prediction(client, *args, timeout: float = None, **kwargs):
+        """
+        Runs client.predict(*args, **kwargs) on the prediction threads. The prediction is
+        given up (and its gradio job cancelled) after timeout seconds, GRADIO_PREDICT_TIMEOUT
+        by default, so a hung Space frees its thread instead of holding it forever.
+        """
+        timeout = timeout or float(os.getenv("GRADIO_PREDICT_TIMEOUT", 120))
+        predict = functools.partial(BaseGenerator._predict, client, args, kwargs, timeout)
+        return await asyncio.get_running_loop().run_in_executor(get_prediction_executor(), predict)
+
+    @staticmethod
+    def _predict(client, args, kwargs, timeout):
+        if not hasattr(client, "submit"):
+            # Stand-ins such as FakeGradioClient only have predict()
+            return client.predict(*args, **kwargs)
+        job = client.submit(*args, **kwargs)
+        try:
+            return job.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            job.cancel()
+            raise TimeoutError(f"gradio prediction took longer than {timeout:g}s")
@@ -1,43 +1,34 @@
 import sys, os
-from gradio_client import Client
 from PIL import Image
 from tenacity import retry, stop_after_attempt, wait_fixed
-import base64
 
-# Add the parent directory of 'text_to_image' (which is 'utils') to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Add the project root (the parent of 'utils') to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from imgur_uploader import ImgurUploader
+from utils.text_to_image.base_generator import BaseGenerator, GeneratedMedia, make_gradio_client
+from utils.metrics import span
 
-class HandDrawnCartoonGenerator:
-    def __init__(self):
+class HandDrawnCartoonGenerator(BaseGenerator):
+    def __init__(self, http_client=None, store=None, client=None):
+        super().__init__(http_client, store)
         # https://huggingface.co/spaces/fujohnwang/alvdansen-littletinies
-        self.client = Client("fujohnwang/alvdansen-littletinies")
+        self.client = client or make_gradio_client(os.getenv("HAND_DRAWN_CARTOON_SPACE", "fujohnwang/alvdansen-littletinies"))
 
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def generate_image(self, prompt, model_name="Hand drawn cartoon style"):
+    async def _generate(self, prompt, model_name="Hand drawn cartoon style"):
         try:            
             print(f"Attempting to connect to alvdansen-littletinies generate image with prompt: {prompt}")
 
-            result = self.client.predict(prompt, api_name="/predict") #return the image path for example: "C:\Users\nerom\AppData\Local\Temp\gradio\3b0fa64204cf190d1fa77b49010b28c50a662ece\image.webp"
+            result = await self.run_prediction(self.client, prompt, api_name="/predict") #return the image path for example: "C:\Users\nerom\AppData\Local\Temp\gradio\3b0fa64204cf190d1fa77b49010b28c50a662ece\image.webp"
             print(f"Image generated at: {result}")
 
-            image_path = self.convert_webp_to_png(result)
-            # convert webp file to base64
-            with open(image_path, "rb") as image_file:
-                image_base64 = base64.b64encode(image_file.read()).decode()
-
-            uploader = ImgurUploader()
-
-            image_url = uploader.upload_media_to_imgur(
-                 image_base64, 
-                 "image",
-                 model_name,  # Title
-                 prompt  # Description
-            )
-            return image_url         
+            with span("image_conversion", "hand_drawn_cartoon_style"):
+                image_path = await self.run_blocking(self.convert_webp_to_png, result)
+            return GeneratedMedia("image", model_name, prompt, path=image_path)
         except Exception as e:
             print(f"Error generating hand-drawn cartoon image: {e}")
+            # The Space may have restarted, let the registry rebuild the client
+            self.mark_stale()
             return None
 
     @staticmethod
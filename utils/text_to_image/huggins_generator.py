@@ -1,18 +1,19 @@
 import sys, os
-import base64
-import requests
-from dotenv import load_dotenv
 from tenacity import retry, stop_after_attempt, wait_fixed
 import time
 
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from imgur_uploader import ImgurUploader
+from utils.config import load_config
+from utils.text_to_image.base_generator import BaseGenerator, GeneratedMedia
+from utils.metrics import span
+from utils.rate_limiter import get_rate_limiter, RateLimitedError
 
-load_dotenv()
+load_config()
 
-class HugginsGenerator:
-    def __init__(self):
+class HugginsGenerator(BaseGenerator):
+    def __init__(self, http_client=None, store=None):
+        super().__init__(http_client, store)
         self.HF_TOKEN = os.getenv("HF_TOKEN")
         self.HF_URL = os.getenv("HF_URL")
         
@@ -20,16 +21,15 @@ class HugginsGenerator:
             raise ValueError("Hugging Face token must be set in environment variables")
         if not self.HF_URL:
             raise ValueError("Hugging Face URL must be set in environment variables")
-        
-        self.uploader = ImgurUploader()
     
     @staticmethod
     def add_timestamp(prompt):
         timestamp = int(time.time())
         return f"{prompt} [Timestamp: {timestamp}]"
 
+    # A 429 raises RateLimitedError, so the retry waits its turn in the rate limiter
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def generate_image(self, prompt, model_name, negative_prompt=None):
+    async def _generate(self, prompt, model_name, negative_prompt=None):
         if not self.HF_TOKEN or not self.HF_URL:
             raise ValueError("Hugging Face token and URL must be set in environment variables")
         
@@ -38,31 +38,33 @@ class HugginsGenerator:
         url = self.HF_URL + model_name        
         headers = {"Authorization": f"Bearer {self.HF_TOKEN}"}
     
+        rate_limiter = get_rate_limiter()
         try:
             print(f"Attempting to connect to model '{model_name}' at URL: {url}")            
             payload = {
                 "inputs": prompt_with_timestamp,
                 "negative_prompt": negative_prompt
             }
-            response = requests.post(url, headers=headers, json=payload)
-
-            if response.status_code != 200:
-                print(f"Error: Non-200 response received: {response.status_code}")
-                return None
-
-            image_bytes = response.content
-            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-
-            image_url = self.uploader.upload_media_to_imgur(
-                image_base64, 
-                "image",
-                model_name,  # Title
-                prompt  # Description
-            )
-            if image_url:
-                return image_url
-            else:
-                return None
+            await rate_limiter.acquire('huggingface', self.HF_TOKEN)
+            async with self.http.session.post(url, headers=headers, json=payload) as response:
+                rate_limiter.observe('huggingface', self.HF_TOKEN, response.status, response.headers)
+                if response.status == 429:
+                    raise RateLimitedError(f"Hugging Face rate limit reached for '{model_name}'")
+                if response.status != 200:
+                    print(f"Error: Non-200 response received: {response.status}")
+                    return None
+                # The image is read once and handed on as is, without base64
+                with span("download", "huggingface", model_name):
+                    data = await response.read()
+                return GeneratedMedia(
+                    "image",
+                    model_name,  # Title
+                    prompt,  # Description
+                    data=data,
+                    content_type=response.content_type
+                )
+        except RateLimitedError:
+            raise
         except Exception as e:
             print(f"Error generating image: {e}")
             return None
@@ -1,23 +1,14 @@
-import requests
-from PIL import Image
-import io
+import asyncio
+import aiohttp
 import sys, os
 from urllib.parse import quote
-import base64
-import streamlit as st
-try:
-    import speech_recognition as sr
-    SPEECH_RECOGNITION_AVAILABLE = True
-except ImportError:
-    sr = None
-    SPEECH_RECOGNITION_AVAILABLE = False
-    print("speech_recognition not available - audio transcription disabled")
-from dotenv import load_dotenv
-
-# Add the parent directory of 'text_to_image' (which is 'utils') to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
-from imgur_uploader import ImgurUploader
+
+# Add the project root (the parent of 'utils') to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from utils.text_to_image.base_generator import BaseGenerator, GeneratedMedia
+from utils.metrics import span
+from utils.rate_limiter import get_rate_limiter
 # from pollinations_generator import PollinationsGenerator  # Circular import - commented out
 # from together_ai_generator import TogetherAIGenerator  # File doesn't exist - commented out
 
@@ -37,50 +28,46 @@ from imgur_uploader import ImgurUploader
 
 ## Response
 # The API returns a raw image file (typically JPEG or PNG) as the response body. You can directly embed the image in your HTML or Markdown.
-class PollinationsGenerator:
-    def __init__(self):
-        self.pollinations_url = "https://image.pollinations.ai/prompt/{prompt}?model={model}&width=1280&height=720&seed=42&nologo=true&enhance=true"
-
-    def generate_image(self, prompt, model_name, negative_prompt=None):
+class PollinationsGenerator(BaseGenerator):
+    # A fixed seed makes results reproducible, which is what lets them be cached.
+    # enhance has an LLM rewrite the prompt first, which no seed makes reproducible
+    DEFAULT_SEED = 42
+
+    def __init__(self, http_client=None, store=None):
+        super().__init__(http_client, store)
+        self.pollinations_url = os.getenv(
+            "POLLINATIONS_URL",
+            "https://image.pollinations.ai/prompt/{prompt}?model={model}&width=1280&height=720&seed={seed}&nologo=true&enhance={enhance}"
+        )
+
+    async def _generate(self, prompt, model_name, negative_prompt=None, seed=DEFAULT_SEED, enhance=False):
         encoded_prompt = quote(prompt)
-        url = self.pollinations_url.format(prompt=encoded_prompt, model=model_name)
+        url = self.pollinations_url.format(prompt=encoded_prompt, model=model_name, seed=seed,
+                                           enhance="true" if enhance else "false")
         
         if negative_prompt:
             url += f"&negative_prompt={quote(negative_prompt)}"
         
+        rate_limiter = get_rate_limiter()
         try:
-            uploader = ImgurUploader()
-            base64_image = self.convert_image_url_to_base64(url)
-            if base64_image:
-                image_url = uploader.upload_media_to_imgur(
-                     base64_image, 
-                     "image",
-                     model_name,  # Title
-                     prompt  # Description
+            await rate_limiter.acquire('pollinations')
+            # The image is read once and handed on as is, without base64 or PIL
+            async with self.http.session.get(url) as response:
+                rate_limiter.observe('pollinations', None, response.status, response.headers)
+                response.raise_for_status()
+                with span("download", "pollinations", model_name):
+                    data = await response.read()
+                return GeneratedMedia(
+                    "image",
+                    model_name,  # Title
+                    prompt,  # Description
+                    data=data,
+                    content_type=response.content_type
                 )
-                return image_url
-            else:
-                print("Failed to convert image to base64")
-                return None 
-        except requests.exceptions.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             print(f"Error generating image with Pollinations: {e}")
             return None    
 
-    @staticmethod
-    def convert_image_url_to_base64(image_url):
-        try:
-            response = requests.get(image_url)
-            response.raise_for_status()
-            img = Image.open(io.BytesIO(response.content))
-            buffered = io.BytesIO()
-            img.save(buffered, format=img.format)
-            image_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-            return image_base64
-        except Exception as e:
-            print(f"Failed to convert image from URL: {image_url}")
-            print(f"Error: {str(e)}")
-            return None
-
 def test(upload_dir="uploads", model_name="turbo", filename=None):    
     generator = PollinationsGenerator()
     prompt = "A fast red color car"
@@ -105,8 +92,14 @@ EXAMPLES = [
     "אבטיח, לחם, שמן זית, ברכה"
 ]
 
+# The Streamlit demo below imports streamlit and speech_recognition itself, so the
+# generator can be imported without them
 def transcribe_audio():
-    if not SPEECH_RECOGNITION_AVAILABLE:
+    import streamlit as st
+    try:
+        import speech_recognition as sr
+    except ImportError:
+        print("speech_recognition not available - audio transcription disabled")
         st.error("אודיו הקלטה לא זמינה - המודול speech_recognition לא מותקן")
         return None
     
@@ -138,6 +131,7 @@ def generate_hebrew_text(prompt):
     return f"סל ביכורים מקסים עם {prompt} - מוכן לחג שבועות!"
 
 def main():
+    import streamlit as st
     st.set_page_config(
         page_title="מה תביא לביכורים? 🎉",
         page_icon="🎉",
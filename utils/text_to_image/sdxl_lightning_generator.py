@@ -1,56 +1,46 @@
 import sys
 import os
-from gradio_client import Client
 from PIL import Image
-from dotenv import load_dotenv
-import base64
 import time
 import random
 from tenacity import retry, stop_after_attempt, wait_fixed
 
-# Add the parent directory of 'text_to_image' (which is 'utils') to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Add the project root (the parent of 'utils') to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from imgur_uploader import ImgurUploader
+from utils.config import load_config
+from utils.text_to_image.base_generator import BaseGenerator, GeneratedMedia, make_gradio_client
 
 # Load environment variables from .env file
-load_dotenv()
+load_config()
 
-class SDXLLightningGenerator:
-    def __init__(self):
+class SDXLLightningGenerator(BaseGenerator):
+    def __init__(self, http_client=None, store=None):
+        super().__init__(http_client, store)
         # https://huggingface.co/ByteDance/SDXL-Lightning
         HF_TOKEN = os.getenv("HF_TOKEN")
         if not HF_TOKEN:
             raise ValueError("Hugging Face token must be set in environment variables")
-        self.client = Client("ByteDance/SDXL-Lightning", hf_token=HF_TOKEN)
+        self.client = make_gradio_client("ByteDance/SDXL-Lightning", hf_token=HF_TOKEN)
         
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def generate_image(self, prompt, model_name="SDXL Lightning"):        
+    async def _generate(self, prompt, model_name="SDXL Lightning"):        
         try:
             print(f"Attempting to connect to SDXL-Lightning to generate image with prompt: {prompt}")
 
-            result = self.client.predict(
+            result = await self.run_prediction(
+                self.client,
                 prompt,
                 ckpt="4-Step",
                 api_name="/generate_image"
             )
             
-            image_path = self.convert_webp_to_png(result)
-            # convert webp file to base64
-            with open(image_path, "rb") as image_file:
-                image_base64 = base64.b64encode(image_file.read()).decode()
-
-            uploader = ImgurUploader()
-
-            image_url = uploader.upload_media_to_imgur(
-                    image_base64, 
-                    "image",
-                    model_name,  # Title
-                    prompt  # Description
-            )
-            return image_url
+            image_path = await self.run_blocking(self.convert_webp_to_png, result)
+            return GeneratedMedia("image", model_name, prompt, path=image_path)
         except Exception as e:
                 print(f"Error generating image: {e}")
+                # The Space may have restarted, let the registry rebuild the client
+                self.mark_stale()
                 return None
         
     @staticmethod
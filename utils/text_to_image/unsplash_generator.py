@@ -1,20 +1,25 @@
-import os
-import requests
+import os, sys
 from urllib.parse import urlencode
 
-class UnsplashGenerator:
-    def __init__(self):
+# Add the project root (the parent of 'utils') to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from utils.text_to_image.base_generator import BaseGenerator, GeneratedMedia
+
+class UnsplashGenerator(BaseGenerator):
+    def __init__(self, http_client=None, store=None):
+        super().__init__(http_client, store)
         self.access_key = os.getenv("UNSPLASH_ACCESS_KEY")
         self.base_url = "https://api.unsplash.com/search/photos"
     
-    def generate_image(self, query):
+    async def _generate(self, query):
         # URL-encode the query
         encoded_query = urlencode({'query': query})
         url = f"{self.base_url}?{encoded_query}&client_id={self.access_key}"
-        response = requests.get(url)
-        data = response.json()
+        data = await self.fetch_json('get', url, rate_limit=('unsplash', self.access_key))
         if data['results']:
-            return data['results'][0]['urls']['regular']
+            # Unsplash photos are already public, there is nothing to store
+            return GeneratedMedia("image", "Unsplash", query, url=data['results'][0]['urls']['regular'])
         return None
 
 # Example usage
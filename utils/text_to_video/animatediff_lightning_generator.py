@@ -1,27 +1,27 @@
 import os, sys
-from gradio_client import Client
 from PIL import Image
 from tenacity import retry, stop_after_attempt, wait_fixed
-import base64
 
-# Add the parent directory of 'text_to_image' (which is 'utils') to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Add the project root (the parent of 'utils') to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from imgur_uploader import ImgurUploader
+from utils.text_to_image.base_generator import BaseGenerator, GeneratedMedia, make_gradio_client
 
 # https://huggingface.co/spaces/ByteDance/AnimateDiff-Lightning
-class AnimateDiffLightningGenerator:
-    def __init__(self):
-        self.client = Client("ByteDance/AnimateDiff-Lightning")
+class AnimateDiffLightningGenerator(BaseGenerator):
+    def __init__(self, http_client=None, store=None, client=None):
+        super().__init__(http_client, store)
+        self.client = client or make_gradio_client(os.getenv("ANIMATEDIFF_LIGHTNING_SPACE", "ByteDance/AnimateDiff-Lightning"))
 
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def generate_image(self, prompt):
+    async def _generate(self, prompt):
         try:
             print(f"Attempting to generate animation with prompt: {prompt}")
             
             # Try with different parameter combinations
             try:
-                result = self.client.predict(
+                result = await self.run_prediction(
+                    self.client,
                     prompt,
                     api_name="/generate_image"
                 )
@@ -34,23 +34,18 @@ class AnimateDiffLightningGenerator:
             
             print(f"Animation generated at: {result}")
             # return result['video']  # This should be the file path
-            # Read the MP4 file and encode it in base64
-            with open(result['video'], "rb") as video_file:
-                video_base64 = base64.b64encode(video_file.read()).decode('utf-8')
-            
-            uploader = ImgurUploader()
-
-            video_url = uploader.upload_media_to_imgur(
-                 video_base64, 
-                 "video",
-                 "Hand drawn cartoon style",  # Title
-                 prompt  # Description
+            return GeneratedMedia(
+                "video",
+                "Hand drawn cartoon style",  # Title
+                prompt,  # Description
+                path=result['video'],
+                content_type="video/mp4"
             )
-
-            return video_url
         
         except Exception as e:
             print(f"Error generating animation: {str(e)}")
+            # The Space may have restarted, let the registry rebuild the client
+            self.mark_stale()
             print(f"Error type: {type(e).__name__}")
             print(f"Error details: {e.args}")
             return None
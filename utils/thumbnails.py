@@ -0,0 +1,267 @@
+import os
+import json
+import queue
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from typing import Optional, List
+from PIL import Image, ImageSequence, features
+
+from utils.config import load_config
+
+# Load environment variables from .env file
+load_config()
+
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov')
+# Pillow save() format names by file extension
+SAVE_FORMATS = {'webp': "WEBP", 'avif': "AVIF"}
+# AVIF's default speed takes about a second per image; speed 8 is a few times faster
+# for a slightly larger file
+SAVE_OPTIONS = {'webp': {'quality': 80}, 'avif': {'quality': 60, 'speed': 8}}
+
+def file_hash(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def supported_formats(formats: List[str]) -> List[str]:
+    """Drops the formats this Pillow build cannot encode (AVIF needs Pillow 11.3+ with libavif)."""
+    return [image_format for image_format in formats if image_format in SAVE_FORMATS and features.check(image_format)]
+
+def video_first_frame(video_path: str) -> Image.Image:
+    """The first frame of a video. Needs ffmpeg on the PATH, which is optional."""
+    if shutil.which("ffmpeg") is None:
+        raise ValueError("ffmpeg is required for video posters")
+    with tempfile.TemporaryDirectory() as directory:
+        frame_path = os.path.join(directory, "frame.png")
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-i", video_path, "-frames:v", "1", frame_path], check=True)
+        image = Image.open(frame_path)
+        image.load()
+        return image
+
+class ThumbnailCache:
+    """
+    Builds small WebP/AVIF copies of the example images for the gallery, at a few widths.
+
+    GIFs and videos get a still poster from their first frame, so the gallery never
+    downloads an animation until it is opened. The full-size original is published next
+    to its thumbnails for that click.
+
+    Derivatives are named by the source's content hash, so they are built once per
+    content. A manifest remembers each source's mtime and size, so the hash (and the
+    work) is only redone when a file changes. Files are written under Streamlit's static
+    folder (enableStaticServing in .streamlit/config.toml) and served from base_url.
+
+    Pages call lookup(), which only reads the in-memory manifest: a missing or outdated
+    entry is queued for a background builder thread, and the page shows the original
+    until it is ready. That the files of an entry still exist is checked when the
+    manifest is loaded and when the builder gets to the entry, never on the page.
+
+    Without any format this Pillow build can encode, no thumbnails are built at all.
+    """
+    def __init__(self, root: str = None, base_url: str = None, widths: List[int] = None, formats: List[str] = None):
+        self.root = root or os.getenv("THUMBNAIL_DIR", os.path.join("static", "thumbnails"))
+        self.base_url = (base_url or os.getenv("THUMBNAIL_BASE_URL", "/app/static/thumbnails")).rstrip('/')
+        self.widths = widths or [int(width) for width in os.getenv("THUMBNAIL_WIDTHS", "160,320,640").split(",")]
+        self.formats = supported_formats(formats or os.getenv("THUMBNAIL_FORMATS", "avif,webp").split(","))
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+        self._lock = threading.Lock()
+        # Held while building, never while reading the manifest
+        self._build_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._failed = {}
+        self._builder = None
+        if not self.formats:
+            print("No thumbnail format can be encoded here, the gallery shows the original images")
+        os.makedirs(self.root, exist_ok=True)
+        self._manifest = self._load_manifest()
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        # Entries whose files were deleted since are built again
+        return {source_path: entry for source_path, entry in manifest.items() if self._files_exist(entry['derivatives'])}
+
+    def _path(self, url):
+        return os.path.join(self.root, url.rsplit('/', 1)[-1])
+
+    def _files_exist(self, derivatives) -> bool:
+        urls = [derivatives['full_url']] + [url for candidates in derivatives['sources'].values() for _, url in candidates]
+        return all(os.path.exists(self._path(url)) for url in urls)
+
+    def _save_manifest(self):
+        temp_path = f"{self.manifest_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self._manifest, file, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+
+    def get(self, source_path: str) -> Optional[dict]:
+        """
+        Returns the derivatives of an image, GIF or video, building them if the source is
+        new or has changed:
+
+            {'full_url': ..., 'poster': bool, 'width': ..., 'height': ...,
+             'sources': {'avif': [(width, url), ...], 'webp': [...]}}
+
+        Returns None if the source cannot be read, or no format can be encoded. Blocks
+        while building; pages should call lookup() instead. An entry whose files were
+        deleted meanwhile is built again.
+        """
+        if not self.formats:
+            return None
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return None
+        signature = (stat.st_mtime, stat.st_size)
+        derivatives = self._current(source_path, signature)
+        if derivatives is not None and self._files_exist(derivatives):
+            return derivatives
+        with self._build_lock:
+            # Built by another caller while this one waited
+            derivatives = self._current(source_path, signature)
+            if derivatives is not None and self._files_exist(derivatives):
+                return derivatives
+            try:
+                derivatives = self._build(source_path)
+            except Exception as e:
+                print(f"Could not build thumbnails for {source_path}: {str(e)}")
+                with self._lock:
+                    self._failed[source_path] = signature
+                return None
+            with self._lock:
+                self._manifest[source_path] = {
+                    'mtime': stat.st_mtime, 'size': stat.st_size, 'settings': self._settings(), 'derivatives': derivatives
+                }
+                self._failed.pop(source_path, None)
+                self._save_manifest()
+            return derivatives
+
+    def lookup(self, source_path: str, mtime: float, size: int) -> Optional[dict]:
+        """
+        Returns the derivatives of a source if they are built for this mtime and size, as
+        get() does, without building anything or touching the disk. Otherwise queues the
+        source for the background builder and returns None.
+        """
+        if not self.formats:
+            return None
+        derivatives = self._current(source_path, (mtime, size))
+        if derivatives is not None:
+            return derivatives
+        with self._lock:
+            if self._failed.get(source_path) == (mtime, size):
+                # Unreadable; tried again once the file changes
+                return None
+        self.build_in_background([source_path])
+        return None
+
+    def build_in_background(self, source_paths: List[str]):
+        """Queues sources for the builder thread, which get()s them one at a time."""
+        with self._lock:
+            new_paths = [source_path for source_path in dict.fromkeys(source_paths) if source_path not in self._pending]
+            self._pending.update(new_paths)
+            if new_paths and (self._builder is None or not self._builder.is_alive()):
+                self._builder = threading.Thread(target=self._build_queued, name="thumbnail-builder", daemon=True)
+                self._builder.start()
+        for source_path in new_paths:
+            self._queue.put(source_path)
+
+    def _build_queued(self):
+        while True:
+            source_path = self._queue.get()
+            try:
+                self.get(source_path)
+            finally:
+                with self._lock:
+                    self._pending.discard(source_path)
+
+    def _current(self, source_path, signature) -> Optional[dict]:
+        with self._lock:
+            entry = self._manifest.get(source_path)
+            if entry and (entry['mtime'], entry['size']) == signature and entry['settings'] == self._settings():
+                return entry['derivatives']
+        return None
+
+    def _settings(self):
+        # Entries built with other widths or formats are rebuilt
+        return {'widths': self.widths, 'formats': self.formats}
+
+    def _url(self, file_name):
+        return f"{self.base_url}/{file_name}"
+
+    def _build(self, source_path):
+        content_hash = file_hash(source_path)[:16]
+        extension = os.path.splitext(source_path)[1].lower()
+
+        # The original, for the click-through
+        full_name = content_hash + extension
+        full_path = os.path.join(self.root, full_name)
+        if not os.path.exists(full_path):
+            try:
+                os.link(source_path, full_path)
+            except OSError:
+                shutil.copyfile(source_path, full_path)
+
+        poster = extension == '.gif' or extension in VIDEO_EXTENSIONS
+        image = video_first_frame(source_path) if extension in VIDEO_EXTENSIONS else Image.open(source_path)
+        # JPEGs can be decoded straight at a fraction of their size, close to the largest thumbnail
+        image.draft("RGB", (max(self.widths), max(self.widths)))
+        with image:
+            if poster:
+                # The first frame only
+                image = next(ImageSequence.Iterator(image)).copy()
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+            width, height = image.size
+            sources = {image_format: [] for image_format in self.formats}
+            # Never upscale: widths past the original collapse to the original
+            for target_width in sorted({min(target_width, width) for target_width in self.widths}):
+                resized = None
+                for image_format in self.formats:
+                    file_name = f"{content_hash}_{target_width}.{image_format}"
+                    file_path = os.path.join(self.root, file_name)
+                    if not os.path.exists(file_path):
+                        # Resized once per width, for every format
+                        if resized is None:
+                            resized = image.resize((target_width, max(1, round(height * target_width / width))), Image.LANCZOS)
+                        temp_path = f"{file_path}.{threading.get_ident()}.tmp"
+                        resized.save(temp_path, format=SAVE_FORMATS[image_format], **SAVE_OPTIONS[image_format])
+                        os.replace(temp_path, file_path)
+                    sources[image_format].append((target_width, self._url(file_name)))
+        return {'full_url': self._url(full_name), 'poster': poster, 'width': width, 'height': height, 'sources': sources}
+
+def picture_html(derivatives: dict, alt: str, sizes: str = "100vw", css_class: str = "") -> str:
+    """A lazily loaded <picture> of the thumbnails, linked to the full-size original."""
+    formats = {image_format: candidates for image_format, candidates in derivatives['sources'].items() if candidates}
+    if not formats:
+        return f'<a href="{derivatives["full_url"]}" target="_blank"><img src="{derivatives["full_url"]}" alt="{alt}" class="{css_class}" loading="lazy"></a>'
+    sources = "".join(
+        f'<source type="image/{image_format}" srcset="{", ".join(f"{url} {width}w" for width, url in candidates)}" sizes="{sizes}">'
+        for image_format, candidates in formats.items()
+    )
+    # The last format listed (WebP by default) is the fallback for browsers without <picture>
+    fallback_width, fallback_url = list(formats.values())[-1][0]
+    return (
+        f'<a href="{derivatives["full_url"]}" target="_blank">'
+        f'<picture>{sources}<img src="{fallback_url}" alt="{alt}" class="{css_class}" loading="lazy" decoding="async" '
+        f'width="{fallback_width}" height="{round(derivatives["height"] * fallback_width / derivatives["width"])}"></picture>'
+        f'</a>'
+    )
+
+_thumbnail_cache = None
+_thumbnail_cache_lock = threading.Lock()
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Returns the process-wide thumbnail cache."""
+    global _thumbnail_cache
+    with _thumbnail_cache_lock:
+        if _thumbnail_cache is None:
+            _thumbnail_cache = ThumbnailCache()
+        return _thumbnail_cache
@@ -0,0 +1,143 @@
+import os
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from utils.config import load_config
+from utils.disk_cache import DiskCache
+from utils.catalog import get_catalog
+
+# Load environment variables from .env file
+load_config()
+
+# Google Translate rejects longer requests
+MAX_REQUEST_CHARS = 4500
+
+class TranslationCache:
+    """
+    Memoizes English translations of prompts.
+
+    An in-memory LRU sits in front of a persistent SQLite store, so repeated prompts
+    (such as the Examples.json prompts) never reach the translation service twice.
+    """
+    def __init__(self, path: str = None, max_memory_entries: int = None, translator=None):
+        self.store = DiskCache(
+            path or os.getenv("TRANSLATION_CACHE_PATH", os.path.join("cache", "cache.db")),
+            table="translations",
+            max_entries=int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", 20000))
+        )
+        self.max_memory_entries = max_memory_entries or int(os.getenv("TRANSLATION_MEMORY_ENTRIES", 1024))
+        if translator is None:
+            # deep_translator is only loaded once a cache is created
+            from deep_translator import GoogleTranslator
+            translator = GoogleTranslator(source='auto', target='en')
+        self.translator = translator
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, text, translation):
+        with self._lock:
+            self._memory[text] = translation
+            self._memory.move_to_end(text)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, text: str) -> Optional[str]:
+        """Returns a cached translation without calling the translation service."""
+        text = text.strip()
+        if not text:
+            return text
+        with self._lock:
+            if text in self._memory:
+                self._memory.move_to_end(text)
+                return self._memory[text]
+        translation = self.store.get(text)
+        if translation is not None:
+            self._remember(text, translation)
+        return translation
+
+    def translate(self, text: str) -> str:
+        translation = self.get(text)
+        if translation is not None:
+            return translation
+        text = text.strip()
+        translation = self.translator.translate(text)
+        self.store.set(text, translation)
+        self._remember(text, translation)
+        return translation
+
+    async def atranslate(self, text: str) -> str:
+        """Cache hits return right away; misses are translated in a worker thread."""
+        translation = self.get(text)
+        if translation is not None:
+            return translation
+        return await asyncio.to_thread(self.translate, text)
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        """Translates every missing text with as few requests as possible."""
+        texts = [text.strip() for text in texts]
+        missing = list(dict.fromkeys(text for text in texts if text and self.get(text) is None))
+        if missing:
+            translations = {}
+            for chunk in self._chunk(missing):
+                translations.update(zip(chunk, self._translate_chunk(chunk)))
+            self.store.set_many(translations)
+            for text, translation in translations.items():
+                self._remember(text, translation)
+        return [self.get(text) for text in texts]
+
+    @staticmethod
+    def _chunk(texts):
+        chunk, size = [], 0
+        for text in texts:
+            if chunk and size + len(text) + 1 > MAX_REQUEST_CHARS:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(text)
+            size += len(text) + 1
+        if chunk:
+            yield chunk
+
+    def _translate_chunk(self, chunk):
+        # One request per chunk: the texts are sent as lines of a single document.
+        # If the service merges or splits lines, fall back to one request per text.
+        if not any('\n' in text for text in chunk):
+            lines = self.translator.translate("\n".join(chunk)).split("\n")
+            if len(lines) == len(chunk):
+                return [line.strip() for line in lines]
+        return self.translator.translate_batch(chunk)
+
+def load_warm_up_texts() -> List[str]:
+    """Every example prompt and style prefix the UI offers."""
+    catalog = get_catalog()
+    return [example["prompt"] for example in catalog.examples] + [style["prompt_prefix"] for style in catalog.styles]
+
+_translation_cache = None
+_translation_cache_lock = threading.Lock()
+_warm_up_started = False
+
+def get_translation_cache() -> TranslationCache:
+    """Returns the process-wide translation cache."""
+    global _translation_cache
+    with _translation_cache_lock:
+        if _translation_cache is None:
+            _translation_cache = TranslationCache()
+        return _translation_cache
+
+def _warm_up():
+    try:
+        texts = load_warm_up_texts()
+        get_translation_cache().translate_batch(texts)
+        print(f"Translation cache warmed up with {len(texts)} prompts")
+    except Exception as e:
+        print(f"Translation warm-up failed: {str(e)}")
+
+def start_warm_up():
+    """Translates the example prompts and style prefixes once per process, in the background."""
+    global _warm_up_started
+    with _translation_cache_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=_warm_up, name="translation-warm-up", daemon=True).start()
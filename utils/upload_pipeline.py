@@ -0,0 +1,92 @@
+import os
+import asyncio
+import threading
+
+from utils.config import load_config
+from utils.http_client import HttpClient, get_http_client
+from utils.media_store import MediaStore, GeneratedMedia, get_media_store
+
+# Load environment variables from .env file
+load_config()
+
+class UploadPipeline:
+    """
+    The upload stage of the generation pipeline.
+
+    Generators hand their output to submit(), which waits for room on a bounded queue, so
+    a burst of finished generations applies back-pressure instead of piling payloads up in
+    memory. A few workers drain the queue in batches and store each batch concurrently
+    through MediaStore.save_many(). Uploads to rate-limited hosts (Imgur) are paced by
+    the shared rate limiter, per request.
+    """
+    def __init__(self, store: MediaStore = None, http_client: HttpClient = None, queue_size: int = None,
+                 workers: int = None, batch_size: int = None):
+        self._store = store
+        self.http = http_client or get_http_client()
+        self.queue_size = queue_size or int(os.getenv("UPLOAD_QUEUE_SIZE", 16))
+        self.workers = workers or int(os.getenv("UPLOAD_WORKERS", 2))
+        self.batch_size = batch_size or int(os.getenv("UPLOAD_BATCH_SIZE", 5))
+        self._queue = None
+        self._worker_tasks = []
+
+    @property
+    def store(self) -> MediaStore:
+        if self._store is None:
+            self._store = get_media_store()
+        return self._store
+
+    async def submit(self, media: GeneratedMedia) -> str:
+        """Queues the media for storage and returns its public URL once it is stored."""
+        return await self.http.run(self._submit(media))
+
+    async def _submit(self, media):
+        if media.url:
+            # Already public, nothing to upload
+            return media.url
+        self._ensure_workers()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((media, future))
+        return await future
+
+    def _ensure_workers(self):
+        # The queue and workers live on the shared loop, created on first use
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._worker_tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Skip items whose caller has gone away
+            live_batch = [(media, future) for media, future in batch if not future.done()]
+            try:
+                if live_batch:
+                    results = await self.store.save_many([media for media, _ in live_batch])
+                else:
+                    results = []
+            except Exception as e:
+                results = [e] * len(live_batch)
+
+            for (_, future), result in zip(live_batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            for _ in batch:
+                self._queue.task_done()
+
+_upload_pipeline = None
+_upload_pipeline_lock = threading.Lock()
+
+def get_upload_pipeline() -> UploadPipeline:
+    """Returns the process-wide upload pipeline."""
+    global _upload_pipeline
+    with _upload_pipeline_lock:
+        if _upload_pipeline is None:
+            _upload_pipeline = UploadPipeline()
+        return _upload_pipeline